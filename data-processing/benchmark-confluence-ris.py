@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Confluence Page Properties to RIS Citation Converter
+
+Starts a local stand-in for the Confluence REST API (/rest/api/content/search
+and /rest/api/content/{id}) serving synthetic page-properties pages, then runs
+the converter against it and reports throughput, request latency, stage
+timings and peak memory. Latency and 429 responses can be simulated so that
+rate limiting and concurrency settings can be tuned without touching
+confluence.hl7.org.
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import yaml
+
+CONVERTER_DIR = Path(__file__).resolve().parent
+
+SAMPLE_COUNTRIES = ['UK', 'USA', 'Canada', 'Germany', 'Netherlands', 'Australia', 'Japan', 'Brazil']
+SAMPLE_STATUSES = ['Active', 'In Development', 'Retired', 'Planned']
+SAMPLE_TOPICS = ['Terminology', 'Patient Summary', 'Public Health', 'Imaging', 'Medications']
+
+
+def load_converter_module():
+    """Import the converter module that sits next to this script"""
+    if str(CONVERTER_DIR) not in sys.path:
+        sys.path.insert(0, str(CONVERTER_DIR))
+    return importlib.import_module('confluence_ris')
+
+
+class SyntheticConfluence:
+    """Deterministic synthetic page-properties pages"""
+    
+    def __init__(self, page_count, page_kb, seed=0):
+        self.page_count = page_count
+        self.page_kb = page_kb
+        self.seed = seed
+    
+    def page_id(self, index):
+        return str(100000 + index)
+    
+    def page_index(self, page_id):
+        index = int(page_id) - 100000
+        return index if 0 <= index < self.page_count else None
+    
+    def body_html(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        rows = [
+            ('Initiative Name', f'Synthetic Initiative {index}'),
+            ('Governing Organization', f'<a href="https://example.org/org/{index % 37}">Organization {index % 37}</a>'),
+            ('Initiative Start', f'{rng.choice(["January", "March", "June", "October"])} {rng.randint(2005, 2025)}'),
+            ('Method of Development', 'Consensus'),
+            ('Adoption Status', rng.choice(SAMPLE_STATUSES)),
+            ('Development Status', rng.choice(SAMPLE_STATUSES)),
+            ('Type Labels', 'Implementation Guide, FHIR'),
+            ('Topic Labels', ', '.join(rng.sample(SAMPLE_TOPICS, 2))),
+            ('Jurisdiction', rng.choice(SAMPLE_COUNTRIES)),
+            ('Region', rng.choice(SAMPLE_COUNTRIES)),
+            ('External Links', f'<a href="https://example.org/ig/{index}">IG</a><br/>'
+                               f'<a href="https://example.org/spec/{index}">Spec</a>')
+        ]
+        table = ''.join(
+            f'<tr><th class="confluenceTh">{key}</th><td class="confluenceTd">{value}</td></tr>'
+            for key, value in rows
+        )
+        html = (f'<div class="plugin-tabmeta-details"><div class="table-wrap">'
+                f'<table class="confluenceTable"><tbody>{table}</tbody></table></div></div>')
+        
+        # Pad the rest of the page with ordinary content up to the requested size
+        filler = ('<div class="section"><h2>Background</h2><p>Lorem ipsum <strong>dolor</strong> sit amet, '
+                  '<a href="https://example.org/ref">consectetur</a> adipiscing elit.</p>'
+                  '<ul><li>One</li><li>Two</li></ul></div>')
+        target = self.page_kb * 1024
+        if len(html) < target:
+            html += filler * ((target - len(html)) // len(filler) + 1)
+        return html
+    
+    def page(self, index, with_body=True):
+        page = {
+            'id': self.page_id(index),
+            'type': 'page',
+            'title': f'Synthetic Initiative {index}',
+            'version': {'number': 1 + index % 3},
+            'space': {'key': 'BENCH'},
+            'metadata': {'labels': {'results': [{'name': 'initiative'}]}}
+        }
+        if with_body:
+            page['body'] = {'view': {'value': self.body_html(index), 'representation': 'storage'}}
+        return page
+
+
+class MockConfluenceServer:
+    """Local HTTP server imitating the Confluence content search and page endpoints"""
+    
+    def __init__(self, site, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, retry_after=0.05, seed=0):
+        self.site = site
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.responses_429 = 0
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def _simulate(self):
+        """Return (delay seconds, rate limited?) for one request"""
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            limited = self.rng.random() < self.rate_429
+            if limited:
+                self.responses_429 += 1
+        return delay, limited
+    
+    def _search(self, query):
+        start = int(query.get('start', ['0'])[0])
+        limit = int(query.get('limit', ['25'])[0])
+        with_body = 'body.view' in query.get('expand', [''])[0]
+        
+        end = min(start + limit, self.site.page_count)
+        results = [self.site.page(index, with_body) for index in range(start, end)]
+        response = {
+            'results': results,
+            'start': start,
+            'limit': limit,
+            'size': len(results),
+            'totalSize': self.site.page_count,
+            '_links': {'base': self.base_url, 'context': ''}
+        }
+        if end < self.site.page_count:
+            next_query = {key: values[0] for key, values in query.items()}
+            next_query['start'] = end
+            response['_links']['next'] = '/rest/api/content/search?' + urlencode(next_query)
+        return response
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                delay, limited = server._simulate()
+                if delay:
+                    time.sleep(delay)
+                if limited:
+                    self.send_response(429)
+                    self.send_header('Retry-After', str(server.retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/rest/api/content/search':
+                    payload = server._search(query)
+                elif url.path.startswith('/rest/api/content/'):
+                    index = server.site.page_index(url.path.rsplit('/', 1)[1])
+                    if index is None:
+                        self.send_error(404)
+                        return
+                    payload = server.site.page(index)
+                else:
+                    self.send_error(404)
+                    return
+                
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        return Handler
+
+
+def percentile_ms(values, fraction):
+    """Nearest-rank percentile of a list of durations in seconds, in milliseconds"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+
+class StageRecorder:
+    """Collects wall time, request latencies and peak memory for one benchmark stage"""
+    
+    def __init__(self, converter, trace_memory):
+        self.converter = converter
+        self.trace_memory = trace_memory
+        self.latencies = []
+        self._session_get = converter.session.get
+    
+    def _timed_get(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._session_get(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+    
+    @contextlib.contextmanager
+    def measure(self, results, name, items):
+        """Time the body of the with-block; `items` is filled in by the caller"""
+        self.latencies = []
+        self.converter.session.get = self._timed_get
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield items
+        finally:
+            elapsed = time.perf_counter() - started
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.converter.session.get = self._session_get
+            
+            count = items.get('count', 0)
+            results[name] = {
+                'items': count,
+                'seconds': elapsed,
+                'items_per_sec': count / elapsed if elapsed else None,
+                'requests': len(self.latencies),
+                'latency_p50_ms': percentile_ms(self.latencies, 0.50),
+                'latency_p95_ms': percentile_ms(self.latencies, 0.95),
+                'peak_memory_mb': peak / (1024 * 1024) if peak is not None else None
+            }
+
+
+def write_config(path, base_url, args):
+    config = {
+        'base_url': base_url,
+        'rate_limit_delay': args.delay,
+        'rate_limit_burst': args.burst,
+        'adaptive_rate_limit': not args.fixed_rate,
+        'concurrency': args.concurrency,
+        'parse_workers': args.workers,
+        'max_retries': args.max_retries,
+        'retry_delay': args.retry_delay,
+        'search_page_size': args.page_size,
+        'html_parser': args.html_parser,
+        'cache_dir': None
+    }
+    with open(path, 'w') as f:
+        yaml.dump(config, f, default_flow_style=False)
+
+
+def run_benchmark(args):
+    module = load_converter_module()
+    site = SyntheticConfluence(args.pages, args.page_kb, seed=args.seed)
+    results = {}
+    
+    with MockConfluenceServer(site, args.latency_ms, args.jitter_ms, args.rate_429,
+                              args.retry_after, seed=args.seed) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = Path(tmp_dir) / 'confluence.yaml'
+        write_config(config_path, server.base_url, args)
+        cql = 'label="initiative"'
+        
+        converter = module.ConfluenceRISConverter(str(config_path))
+        recorder = StageRecorder(converter, args.memory)
+        
+        # Stage: search only (no bodies)
+        converter.search_expand_body = False
+        with recorder.measure(results, 'search', {}) as items:
+            pages = list(converter.iter_search_pages_cql(cql))
+            items['count'] = len(pages)
+        
+        # Stage: per-page fetch of every search result
+        with recorder.measure(results, 'fetch', {}) as items:
+            fetched = [module.PageRecord.from_json(page_data)
+                       for _, page_data in converter.iter_page_data(pages) if page_data]
+            items['count'] = len(fetched)
+        
+        # Stage: parse the properties tables
+        bodies = [record.body for record in fetched]
+        with recorder.measure(results, 'parse', {}) as items:
+            parsed = [converter.parse_html_table(body) for body in bodies]
+            items['count'] = len(parsed)
+        
+        # Stage: RIS conversion
+        converter.access_date = None
+        with recorder.measure(results, 'convert', {}) as items:
+            for record, properties in zip(fetched, parsed):
+                converter.convert_to_ris(record, properties)
+            items['count'] = len(parsed)
+        
+        del pages, fetched, bodies, parsed
+        
+        # End to end: process_pages_cql with bodies expanded in the search
+        converter.search_expand_body = not args.per_page_fetch
+        output_dir = Path(tmp_dir) / 'output'
+        with recorder.measure(results, 'end_to_end', {}) as items:
+            citations = converter.process_pages_cql(cql, ['Benchmark'], str(output_dir))
+            items['count'] = len(citations)
+        
+        converter.close()
+        
+        results['server'] = {'requests': server.requests, 'responses_429': server.responses_429}
+    
+    results['process'] = {'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    results['settings'] = {
+        key: getattr(args, key) for key in (
+            'pages', 'page_kb', 'latency_ms', 'jitter_ms', 'rate_429', 'retry_after', 'delay',
+            'burst', 'concurrency', 'workers', 'page_size', 'html_parser', 'per_page_fetch'
+        )
+    }
+    return results
+
+
+def print_report(results):
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+    
+    print(f"{'stage':<12} {'items':>7} {'seconds':>9} {'items/s':>10} {'requests':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'peak MB':>8}")
+    for stage in ('search', 'fetch', 'parse', 'convert', 'end_to_end'):
+        row = results[stage]
+        print(f"{stage:<12} {row['items']:>7} {row['seconds']:>9.3f} {fmt(row['items_per_sec'], '>10.1f')} "
+              f"{row['requests']:>9} {fmt(row['latency_p50_ms'], '>8.1f')} {fmt(row['latency_p95_ms'], '>8.1f')} "
+              f"{fmt(row['peak_memory_mb'], '>8.1f')}")
+    
+    server = results['server']
+    print(f"\nServer: {server['requests']} requests, {server['responses_429']} simulated 429 responses")
+    print(f"Process max RSS: {results['process']['max_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the Confluence to RIS converter against a local mock Confluence server',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s --pages 500
+  %(prog)s --pages 2000 --page-kb 50 --latency-ms 30 --rate-429 0.02 --concurrency 8
+  %(prog)s --pages 1000 --delay 0.1 --burst 5 --json bench.json
+        """
+    )
+    
+    parser.add_argument('--pages', type=int, default=200,
+                        help='Number of synthetic pages served by the mock server')
+    parser.add_argument('--page-kb', type=int, default=20,
+                        help='Approximate size of each page body in KB')
+    parser.add_argument('--latency-ms', type=float, default=10.0,
+                        help='Simulated server latency per request (milliseconds)')
+    parser.add_argument('--jitter-ms', type=float, default=5.0,
+                        help='Random +/- variation applied to the latency (milliseconds)')
+    parser.add_argument('--rate-429', type=float, default=0.0,
+                        help='Fraction of requests answered with 429 Too Many Requests')
+    parser.add_argument('--retry-after', type=float, default=0.05,
+                        help='Retry-After value sent with simulated 429 responses (seconds)')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='Converter rate_limit_delay (seconds between requests)')
+    parser.add_argument('--burst', type=int, default=1,
+                        help='Converter rate_limit_burst')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Converter concurrency (parallel page fetches)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Converter parse_workers (processes for parsing/conversion)')
+    parser.add_argument('--page-size', type=int, default=100,
+                        help='Converter search_page_size')
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help='Converter max_retries')
+    parser.add_argument('--retry-delay', type=float, default=0.1,
+                        help='Converter retry_delay (seconds)')
+    parser.add_argument('--html-parser', choices=['stream', 'bs4'], default='stream',
+                        help='Converter HTML parser backend')
+    parser.add_argument('--fixed-rate', action='store_true',
+                        help='Keep the request rate at --delay instead of adapting it to server feedback')
+    parser.add_argument('--per-page-fetch', action='store_true',
+                        help='End-to-end run fetches each page instead of expanding bodies in the search')
+    parser.add_argument('--memory', action='store_true',
+                        help='Track peak Python memory per stage with tracemalloc (slows the run)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for synthetic content, latency and 429 simulation')
+    parser.add_argument('--json',
+                        help='Also write the results as JSON to this file')
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args)
+    print_report(results)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
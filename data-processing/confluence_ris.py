@@ -0,0 +1,3230 @@
+#!/usr/bin/env python3
+"""
+Generic Confluence Page Properties to RIS Citation Converter
+
+This script fetches Confluence pages using CQL queries and converts
+their page properties (displayed as HTML tables) into RIS citation format.
+
+It can also be imported: iter_citations() yields Citation records without
+printing progress, and ConfluenceRISConverter exposes the individual stages.
+"""
+
+import re
+import argparse
+import bisect
+import contextlib
+import gzip
+import hashlib
+import html
+import html.entities
+import importlib.util
+import itertools
+import os
+import random
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+import json
+import sqlite3
+import sys
+import zlib
+
+
+def _lazy_import(name):
+    """Import a module on first attribute access (keeps --help and library imports fast)"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# Heavy dependencies are loaded when first used (bs4 only by the 'bs4' parser backend)
+requests = _lazy_import('requests')
+yaml = _lazy_import('yaml')
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request worker.
+    
+    Tokens refill at one per `interval` seconds up to `burst`. A pause (e.g. from
+    a 429 Retry-After) blocks all workers until it expires.
+    """
+    
+    def __init__(self, interval, burst=1):
+        self.interval = interval  # seconds per token
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.log = print  # progress output; the converter passes its own log method
+    
+    def _refill(self, now):
+        if self.interval <= 0:
+            self._tokens = float(self.burst)
+        else:
+            elapsed = now - self._updated
+            self._tokens = min(float(self.burst), self._tokens + elapsed / self.interval)
+        self._updated = now
+    
+    def acquire(self):
+        """Block until a token is available and return the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
+            waited += wait
+    
+    def pause(self, seconds):
+        """Stop handing out tokens to all workers for the given number of seconds"""
+        with self._lock:
+            self._pause(seconds)
+    
+    def _pause(self, seconds):
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+    
+    def reset(self, interval):
+        """Change the spacing between requests"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.interval = interval
+    
+    @property
+    def rate(self):
+        """Requests per second currently allowed (inf when unlimited)"""
+        return 1 / self.interval if self.interval > 0 else float('inf')
+    
+    def record_response(self, status_code, latency, headers):
+        """Feedback from a completed request (a fixed-rate bucket ignores it)"""
+
+
+def _header_float(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_rate(rate):
+    return 'unlimited' if rate == float('inf') else f"{rate:.2f} req/s"
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket whose rate follows server feedback (AIMD).
+    
+    The spacing between requests starts at `interval` and is kept between
+    `min_interval` (the rate ceiling, by default `interval` itself so the
+    configured rate is never exceeded) and `max_interval` (the floor). A 429
+    or 5xx response halves the rate (the observed one when unlimited). Every
+    INCREASE_AFTER consecutive fast responses close half the gap to the rate
+    that failed, adding at least a tenth of that rate or of the starting rate
+    (and at least INCREASE_STEP requests per second). With no ceiling the
+    rate becomes unlimited again once it is back where it failed. Confluence's
+    rate-limit headers (X-RateLimit-FillRate / X-RateLimit-Interval-Seconds)
+    cap the rate at what the server allows, and an exhausted
+    X-RateLimit-Remaining pauses every worker until the server refills it.
+    """
+    
+    INCREASE_AFTER = 10  # consecutive fast responses per increase
+    INCREASE_STEP = 0.25  # minimum requests per second added on each increase
+    SLOW_RESPONSE = 2.0  # seconds; slower responses never raise the rate
+    DECREASE_HOLDOFF = 1.0  # seconds; concurrent failures only slow down once
+    BACKOFF_BASE = 0.1  # spacing used when backing off before any response was timed
+    BACKOFF_MIN = 0.001  # smallest spacing to back off from
+    
+    def __init__(self, interval, burst=1, min_interval=None, max_interval=30.0):
+        super().__init__(interval, burst)
+        self.min_interval = interval if min_interval is None else min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.server_interval = 0.0  # spacing required by the server's rate-limit headers
+        self.increase_step = self._increase_step(interval)
+        self._observed_interval = None  # moving average of the time between responses
+        self._last_response = None
+        self._backoff_rate = 0.0  # rate reached when the last failure came in
+        self._fast_streak = 0
+        self._last_decrease = 0.0
+        self._direction = 0  # last change: 1 speeding up, -1 slowing down
+    
+    def _increase_step(self, interval):
+        return max(self.INCREASE_STEP, 0.1 / interval) if interval > 0 else self.INCREASE_STEP
+    
+    def reset(self, interval):
+        """Change the spacing between requests; it also becomes the rate ceiling"""
+        with self._lock:
+            self.min_interval = interval
+            self.max_interval = max(self.max_interval, interval)
+            self.increase_step = self._increase_step(interval)
+        super().reset(interval)
+    
+    def record_response(self, status_code, latency, headers):
+        """Adjust the rate after a response"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._observe(now)
+            headroom = self._apply_headers(headers)
+            
+            if status_code == 429 or status_code >= 500:
+                self._fast_streak = 0
+                if now - self._last_decrease >= self.DECREASE_HOLDOFF:
+                    self._last_decrease = now
+                    # Without a limit in force, halve the rate actually reached
+                    base = self.interval
+                    if base <= 0:
+                        base = self.BACKOFF_BASE if self._observed_interval is None else self._observed_interval
+                        base = max(base, self.BACKOFF_MIN)
+                    self._backoff_rate = 1 / base
+                    self._set_interval(base * 2, f"HTTP {status_code}")
+            elif latency < self.SLOW_RESPONSE and headroom:
+                self._fast_streak += 1
+                if self._fast_streak >= self.INCREASE_AFTER and self.interval > 0:
+                    self._fast_streak = 0
+                    # Climb quickly back towards the rate that failed, then carefully beyond it
+                    rate = self.rate + max(self.increase_step, self._backoff_rate / 10,
+                                           (self._backoff_rate - self.rate) / 2)
+                    if self.min_interval <= 0 and self._backoff_rate and rate >= self._backoff_rate:
+                        # No ceiling: stop limiting once back at the rate that failed
+                        self._backoff_rate = 0.0
+                        self._set_interval(0.0, "responses fast")
+                    else:
+                        self._set_interval(1 / rate, "responses fast")
+            else:
+                self._fast_streak = 0
+    
+    def _observe(self, now):
+        """Track the spacing between responses across all workers"""
+        if self._last_response is not None:
+            gap = min(now - self._last_response, self.max_interval)
+            if self._observed_interval is None:
+                self._observed_interval = gap
+            else:
+                self._observed_interval += (gap - self._observed_interval) * 0.2
+        self._last_response = now
+    
+    def _apply_headers(self, headers):
+        """Follow the server's rate-limit headers; returns False when close to the limit"""
+        fill_rate = _header_float(headers, 'X-RateLimit-FillRate')
+        period = _header_float(headers, 'X-RateLimit-Interval-Seconds')
+        if fill_rate and period:
+            self.server_interval = period / fill_rate
+            if self.interval < self.server_interval:
+                self._set_interval(self.server_interval, "server rate limit")
+        
+        limit = _header_float(headers, 'X-RateLimit-Limit')
+        remaining = _header_float(headers, 'X-RateLimit-Remaining')
+        if remaining is None:
+            return True
+        
+        if remaining < 1:
+            # Wait for the reset time (epoch seconds or a delay), or one refill
+            wait = _header_float(headers, 'X-RateLimit-Reset')
+            if wait is not None and wait > 1e9:
+                wait -= time.time()
+            if wait is None or wait <= 0:
+                wait = self.server_interval or max(self.interval, self.BACKOFF_BASE)
+            self._pause(min(wait, self.max_interval))
+        return remaining >= (limit or 0) * 0.1 and remaining >= 1
+    
+    def _set_interval(self, interval, reason):
+        interval = min(self.max_interval, max(self.min_interval, self.server_interval, interval))
+        if abs(interval - self.interval) < 1e-9:
+            return
+        old_rate = self.rate
+        direction = 1 if interval < self.interval else -1
+        self.interval = interval
+        
+        # Only turning points are logged; the final rate is in the run metrics
+        if direction != self._direction:
+            self._direction = direction
+            change = 'speeding up' if direction > 0 else 'slowing down'
+            self.log(f"  Request rate {change}: {format_rate(old_rate)} -> {format_rate(self.rate)} ({reason})")
+
+
+class StageHistogram:
+    """Duration histogram with fixed Prometheus-style buckets (seconds)"""
+    
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+    
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+    
+    def cumulative_buckets(self):
+        """(upper bound, observations at or below it) pairs, ending with +Inf"""
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS + (float('inf'),), self.counts):
+            cumulative += count
+            yield bound, cumulative
+    
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'max': round(self.max, 6),
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): count
+                        for bound, count in self.cumulative_buckets()}
+        }
+
+
+class RunMetrics:
+    """Thread-safe counters and per-stage timing histograms for one run.
+    
+    Stages are search and fetch (one observation per HTTP request), parse,
+    convert and write (one per page). Time spent waiting for the rate
+    limiter and backing off after failed requests is counted separately, so
+    a slow run can be attributed to throttling, server latency or parsing.
+    
+    With a path, every observation is appended to it as a JSON line and a
+    summary line is added on close; a path ending in .prom instead receives
+    a Prometheus textfile (for node_exporter's textfile collector) on close.
+    """
+    
+    STAGES = ('search', 'fetch', 'parse', 'convert', 'write')
+    COUNTERS = ('requests', 'retries', 'rate_limited', 'errors', 'not_modified', 'compressed',
+                'bytes_downloaded', 'bytes_transferred', 'throttle_seconds', 'backoff_seconds')
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.stages = {stage: StageHistogram() for stage in self.STAGES}
+        self.gauges = {}
+        self.started = time.monotonic()
+        self._events = None
+        self._lock = threading.Lock()
+    
+    @property
+    def prometheus(self):
+        return self.path is not None and self.path.suffix == '.prom'
+    
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+    
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+    
+    def observe(self, stage, seconds, **details):
+        """Record one duration for a stage (details are only kept in the JSON lines)"""
+        with self._lock:
+            self.stages[stage].observe(seconds)
+            if self.path and not self.prometheus:
+                self._write_event(dict({'event': 'stage', 'stage': stage, 'seconds': round(seconds, 6)}, **details))
+    
+    @contextlib.contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+    
+    def _write_event(self, event):
+        if self._events is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._events = open(self.path, 'a', encoding='utf-8')
+        self._events.write(json.dumps(dict({'ts': round(time.time(), 3)}, **event)) + '\n')
+    
+    def elapsed(self):
+        return time.monotonic() - self.started
+    
+    def summary(self):
+        with self._lock:
+            return {
+                'elapsed_seconds': round(self.elapsed(), 3),
+                'counters': dict(self.counters),
+                'gauges': {name: (None if value == float('inf') else value) for name, value in self.gauges.items()},
+                'stages': {stage: histogram.to_dict() for stage, histogram in self.stages.items()}
+            }
+    
+    def print_summary(self):
+        counters = self.counters
+        print(f"\nRun metrics ({self.elapsed():.1f}s):")
+        print(f"  Requests: {counters['requests']} ({counters['retries']} retries, "
+              f"{counters['rate_limited']} rate limited, {counters['errors']} errors, "
+              f"{counters['not_modified']} not modified)")
+        print(f"  Downloaded: {counters['bytes_downloaded'] / (1024 * 1024):.2f} MB "
+              f"({counters['bytes_transferred'] / (1024 * 1024):.2f} MB on the wire, "
+              f"{counters['compressed']} compressed responses)")
+        print(f"  Waiting: {counters['throttle_seconds']:.1f}s for the rate limiter, "
+              f"{counters['backoff_seconds']:.1f}s backing off after errors")
+        if 'request_rate' in self.gauges:
+            print(f"  Request rate at the end of the run: {format_rate(self.gauges['request_rate'])}")
+        print(f"  {'stage':<10}{'count':>7}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for stage, histogram in self.stages.items():
+            if not histogram.count:
+                continue
+            mean = histogram.total / histogram.count
+            print(f"  {stage:<10}{histogram.count:>7}{histogram.total:>10.2f}{mean * 1000:>10.1f}"
+                  f"{histogram.quantile(0.95) * 1000:>10.1f}{histogram.max * 1000:>10.1f}")
+    
+    def prometheus_text(self):
+        """Render the metrics in the Prometheus text exposition format"""
+        counter_names = {
+            'requests': 'confluence_ris_requests_total',
+            'retries': 'confluence_ris_retries_total',
+            'rate_limited': 'confluence_ris_rate_limited_total',
+            'errors': 'confluence_ris_request_errors_total',
+            'not_modified': 'confluence_ris_not_modified_total',
+            'compressed': 'confluence_ris_compressed_responses_total',
+            'bytes_downloaded': 'confluence_ris_downloaded_bytes_total',
+            'bytes_transferred': 'confluence_ris_transferred_bytes_total',
+            'throttle_seconds': 'confluence_ris_throttle_seconds_total',
+            'backoff_seconds': 'confluence_ris_backoff_seconds_total'
+        }
+        lines = []
+        with self._lock:
+            for name, metric in counter_names.items():
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]}")
+            
+            metric = 'confluence_ris_stage_duration_seconds'
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in self.stages.items():
+                for bound, count in histogram.cumulative_buckets():
+                    le = '+Inf' if bound == float('inf') else bound
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        
+        for name, value in self.gauges.items():
+            lines.append(f"# TYPE confluence_ris_{name} gauge")
+            lines.append(f"confluence_ris_{name} {'+Inf' if value == float('inf') else value}")
+        lines.append("# TYPE confluence_ris_run_duration_seconds gauge")
+        lines.append(f"confluence_ris_run_duration_seconds {self.elapsed():.3f}")
+        lines.append("# TYPE confluence_ris_last_run_timestamp_seconds gauge")
+        lines.append(f"confluence_ris_last_run_timestamp_seconds {int(time.time())}")
+        return '\n'.join(lines) + '\n'
+    
+    def close(self):
+        """Write the Prometheus textfile or the closing JSON summary line"""
+        if not self.path:
+            return
+        if self.prometheus:
+            # Written atomically so the collector never reads a partial file
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, self.path)
+        else:
+            summary = self.summary()
+            with self._lock:
+                self._write_event(dict({'event': 'summary'}, **summary))
+                self._events.close()
+                self._events = None
+
+
+class _TableNode:
+    """Minimal element node built only for the captured properties table"""
+    __slots__ = ('name', 'attrs', 'children')
+    
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+    
+    def descendants(self):
+        """Yield child elements and strings in document order"""
+        for child in self.children:
+            yield child
+            if isinstance(child, _TableNode):
+                yield from child.descendants()
+    
+    def find_all(self, names):
+        if isinstance(names, str):
+            names = (names,)
+        return [node for node in self.descendants() if isinstance(node, _TableNode) and node.name in names]
+    
+    def strings(self):
+        return (node for node in self.descendants() if isinstance(node, str))
+    
+    def get_text(self, separator='', strip=False):
+        strings = self.strings()
+        if strip:
+            strings = (text.strip() for text in strings)
+            strings = (text for text in strings if text)
+        return separator.join(strings)
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class PropertiesTableExtractor(HTMLParser):
+    """Streaming extractor for the first <table> of a page.
+    
+    Builds element nodes only for that table and stops parsing as soon as it
+    closes. Tree construction follows BeautifulSoup's html.parser builder (void
+    elements, end-tag matching, text node boundaries and which strings count as
+    text), so parse_html_table returns the same properties with either backend.
+    """
+    
+    # Elements BeautifulSoup treats as void (closed immediately)
+    VOID_ELEMENTS = {
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+        'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+        'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'
+    }
+    # Strings inside these elements are not part of get_text() output
+    NON_TEXT_CONTAINERS = {'rt', 'rp', 'style', 'script', 'template'}
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.table = None
+        self._stack = []  # open elements (names only outside the table)
+        self._text = []  # pending character data, merged into one string
+        self._non_text_depth = 0
+        self._already_closed_void = []
+    
+    def extract(self, html_content):
+        """Return the first table as a node tree, or None if the page has none"""
+        try:
+            self.feed(html_content)
+            self.close()
+            self._flush_text()
+        except _StopParsing:
+            pass
+        return self.table
+    
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        self._text = []
+        if self.table is not None and not self._non_text_depth:
+            self._stack[-1].children.append(text)
+    
+    def _add_string(self, text):
+        """Add a standalone string (e.g. CDATA) that always counts as text"""
+        self._flush_text()
+        if self.table is not None:
+            self._stack[-1].children.append(text)
+    
+    def handle_starttag(self, tag, attrs, handle_void=True):
+        self._flush_text()
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = '' if value is None else value
+        
+        node = _TableNode(tag, attr_dict)
+        if self.table is not None:
+            self._stack[-1].children.append(node)
+        elif tag == 'table':
+            self.table = node
+        self._stack.append(node)
+        if tag in self.NON_TEXT_CONTAINERS:
+            self._non_text_depth += 1
+        
+        if handle_void and tag in self.VOID_ELEMENTS:
+            self.handle_endtag(tag, check_already_closed=False)
+            self._already_closed_void.append(tag)
+    
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_void=False)
+        self.handle_endtag(tag, check_already_closed=False)
+    
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self._already_closed_void:
+            self._already_closed_void.remove(tag)
+            return
+        
+        self._flush_text()
+        # Pop up to and including the most recent open element with this name
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].name == tag:
+                for node in self._stack[i:]:
+                    if node.name in self.NON_TEXT_CONTAINERS:
+                        self._non_text_depth -= 1
+                    if node is self.table:
+                        raise _StopParsing()
+                del self._stack[i:]
+                break
+    
+    def handle_data(self, data):
+        self._text.append(data)
+    
+    def handle_charref(self, name):
+        # Resolved like bs4: controls are kept, C1 codes are read as windows-1252
+        # and out-of-range numbers or surrogates become U+FFFD
+        hexadecimal = name[:1] in ('x', 'X')
+        match = re.match(r'([0-9a-fA-F]+)(.*)' if hexadecimal else r'([0-9]+)(.*)', name[hexadecimal:], re.S)
+        if not match:
+            self._text.append(name)
+            return
+        number = int(match.group(1), 16 if hexadecimal else 10)
+        if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+            character = '\ufffd'
+        elif 0x80 <= number <= 0x9F:
+            try:
+                character = bytes([number]).decode('cp1252')
+            except UnicodeDecodeError:
+                character = chr(number)
+        else:
+            character = chr(number)
+        self._text.append(character + match.group(2))
+    
+    def handle_entityref(self, name):
+        # Whole names only, as bs4 does: "&copyName" stays literal text
+        character = html.entities.html5.get(name + ';')
+        self._text.append(character if character is not None else f"&{name}")
+    
+    def handle_comment(self, data):
+        self._flush_text()
+    
+    def handle_decl(self, decl):
+        self._flush_text()
+    
+    def handle_pi(self, data):
+        self._flush_text()
+    
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._add_string(data[len('CDATA['):])
+        else:
+            self._flush_text()
+
+
+class CitationWriter:
+    """Streams citations to the selected output formats as they are produced.
+    
+    'ris' writes one file per page plus all_citations_<stamp>.ris, 'csl-json'
+    writes all_citations_<stamp>.json, and 'aggregate' collects per-country and
+    per-year counts. Every file is written under a temporary name and renamed
+    into place, so an interrupted run never leaves a half-written file; the
+    combined files only appear if at least one citation was written.
+    
+    With `keep_partial`, the temporary combined files are kept on failure so
+    a checkpointed run can be resumed from `resume_state` (byte offsets,
+    citation count and aggregate counts).
+    """
+    
+    FORMATS = ('ris', 'csl-json', 'aggregate')
+    
+    def __init__(self, output_dir, run_stamp, formats=('ris',), buffer_size=1024 * 1024,
+                 resume_state=None, keep_partial=False):
+        self.output_path = Path(output_dir)
+        self.formats = formats
+        self.buffer_size = buffer_size
+        self.resume_state = resume_state
+        self.keep_partial = keep_partial
+        self.count = 0
+        self.aggregate = CitationAggregate() if 'aggregate' in formats else None
+        self.combined_paths = {}
+        if 'ris' in formats:
+            self.combined_paths['ris'] = self.output_path / f"all_citations_{run_stamp}.ris"
+        if 'csl-json' in formats:
+            self.combined_paths['csl-json'] = self.output_path / f"all_citations_{run_stamp}.json"
+        self._files = {}
+    
+    def __enter__(self):
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        offsets = {}
+        if self.resume_state:
+            offsets = self.resume_state.get('offsets', {})
+            self.count = self.resume_state.get('count', 0)
+            if self.aggregate and self.resume_state.get('aggregate'):
+                self.aggregate = CitationAggregate.from_dict(self.resume_state['aggregate'])
+        
+        for output_format, path in self.combined_paths.items():
+            partial_path = self._partial_path(path)
+            if output_format in offsets and partial_path.exists():
+                # Drop anything written after the last checkpoint
+                f = open(partial_path, 'r+b', buffering=self.buffer_size)
+                f.truncate(offsets[output_format])
+                f.seek(offsets[output_format])
+            else:
+                f = open(partial_path, 'wb', buffering=self.buffer_size)
+            self._files[output_format] = f
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort(keep_partial=self.keep_partial)
+        return False
+    
+    @property
+    def combined_path(self):
+        """The combined RIS file (or first combined file of another format)"""
+        return next(iter(self.combined_paths.values()), None)
+    
+    def _partial_path(self, path):
+        return path.with_name(f".{path.name}.partial")
+    
+    def write_page(self, filename, ris_citation):
+        """Atomically replace a per-page RIS file and return its path"""
+        file_path = self.output_path / filename
+        tmp_path = file_path.with_name(f".{filename}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(ris_citation)
+        os.replace(tmp_path, file_path)
+        return file_path
+    
+    def append(self, ris_citation, csl_item=None, countries=(), year=None):
+        """Add a citation to the combined outputs"""
+        if 'ris' in self._files:
+            self._files['ris'].write((ris_citation + '\n\n').encode('utf-8'))
+        if 'csl-json' in self._files:
+            separator = '[\n' if self.count == 0 else ',\n'
+            self._files['csl-json'].write((separator + json.dumps(csl_item)).encode('utf-8'))
+        if self.aggregate:
+            self.aggregate.add(countries, year)
+        self.count += 1
+    
+    def offsets(self):
+        """Current byte offset of each combined file (including buffered data)"""
+        return {output_format: f.tell() for output_format, f in self._files.items()}
+    
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+    
+    def commit(self):
+        """Move the combined files into place (or drop them if nothing was written)"""
+        if 'csl-json' in self._files and self.count:
+            self._files['csl-json'].write(b'\n]\n')
+        for output_format, f in self._files.items():
+            f.close()
+            partial_path = self._partial_path(self.combined_paths[output_format])
+            if self.count:
+                os.replace(partial_path, self.combined_paths[output_format])
+            else:
+                partial_path.unlink()
+        self._files = {}
+    
+    def abort(self, keep_partial=False):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        if not keep_partial:
+            self.discard_partials()
+    
+    def discard_partials(self):
+        for path in self.combined_paths.values():
+            self._partial_path(path).unlink(missing_ok=True)
+
+
+class RunCheckpoint:
+    """Append-only journal of a run's progress, used by --resume.
+    
+    The first line describes the run (query, tags, formats, output stamp).
+    Each later line records the search position reached, the page ids handled
+    since the previous line, and the byte offsets, citation count and
+    aggregate counts of the combined files. A line is only written after the
+    combined files have been flushed.
+    """
+    
+    JOURNAL_NAME = '.confluence-checkpoint.jsonl'
+    
+    def __init__(self, output_dir, interval=25):
+        self.journal_path = Path(output_dir) / self.JOURNAL_NAME
+        self.interval = interval
+        self.position = 0
+        self._offsets = {}
+        self._count = 0
+        self._pending_ids = []
+        self._saved_position = 0
+        self._journal = None
+    
+    def load(self):
+        """Return the state of an interrupted run, or None if there is no journal"""
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        
+        state = None
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # torn last line
+            
+            if entry.get('type') == 'run':
+                state = dict(entry, position=0, offsets={}, count=0, aggregate=None, completed_ids=set())
+            elif state and entry.get('type') == 'checkpoint':
+                state['position'] = entry['position']
+                state['offsets'] = entry['offsets']
+                state['count'] = entry['count']
+                state['aggregate'] = entry.get('aggregate')
+                state['completed_ids'].update(entry['ids'])
+        return state
+    
+    def start(self, header, state=None):
+        """Begin a new journal for `header`, or continue the loaded `state`"""
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        if state:
+            self.position = self._saved_position = state['position']
+            self._offsets = state['offsets']
+            self._count = state['count']
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        else:
+            self._journal = open(self.journal_path, 'w', encoding='utf-8')
+            self._journal.write(json.dumps(header) + '\n')
+            self._journal.flush()
+    
+    def mark(self, position, page_id, writer):
+        """Record that every search result before `position` has been handled"""
+        self.position = position
+        self._pending_ids.append(page_id)
+        self._offsets = writer.offsets()
+        self._count = writer.count
+        if self.position - self._saved_position >= self.interval:
+            self.save(writer)
+    
+    def save(self, writer):
+        """Flush the combined files and append a checkpoint line"""
+        writer.flush()
+        entry = {
+            'type': 'checkpoint',
+            'position': self.position,
+            'ids': self._pending_ids,
+            'offsets': self._offsets,
+            'count': self._count,
+            'aggregate': writer.aggregate.counts() if writer.aggregate else None
+        }
+        self._journal.write(json.dumps(entry) + '\n')
+        self._journal.flush()
+        self._pending_ids = []
+        self._saved_position = self.position
+    
+    def close(self):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+    
+    def finish(self):
+        """Remove the journal once the run has completed"""
+        self.close()
+        self.journal_path.unlink(missing_ok=True)
+
+
+class PageCache:
+    """SQLite-backed on-disk cache of page JSON keyed by page id and version number.
+    
+    It also keeps HTTP responses with their ETag/Last-Modified validators,
+    keyed by request URL, so they can be revalidated with conditional
+    requests. Entries older than `ttl` seconds are dropped, and the least
+    recently used entries are evicted once the stored data exceeds `max_bytes`.
+    """
+    
+    def __init__(self, cache_dir, ttl=None, max_bytes=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0  # stored responses confirmed by a 304
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.cache_dir / "pages.sqlite3"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                page_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (page_id, version)
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+        self.evict()
+    
+    def get(self, page_id, version):
+        """Return cached page data for this exact version, or None"""
+        if version is None:
+            return None
+        
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, stored_at FROM pages WHERE page_id = ? AND version = ?",
+                (str(page_id), version)
+            ).fetchone()
+            now = time.time()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            
+            self._db.execute(
+                "UPDATE pages SET accessed_at = ? WHERE page_id = ? AND version = ?",
+                (now, str(page_id), version)
+            )
+            self._db.commit()
+            self.hits += 1
+        
+        return json.loads(zlib.decompress(row[0]))
+    
+    def put(self, page_id, version, page_data):
+        """Store page data, replacing any older versions of the same page"""
+        if version is None:
+            return
+        
+        data = zlib.compress(json.dumps(page_data).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM pages WHERE page_id = ?", (str(page_id),))
+            self._db.execute(
+                "INSERT INTO pages (page_id, version, data, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(page_id), version, data, len(data), now, now)
+            )
+            self._db.commit()
+    
+    def get_response(self, url):
+        """Return (etag, last_modified, body bytes) stored for a request URL, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, data, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or (self.ttl and time.time() - row[3] > self.ttl):
+            return None
+        return row[0], row[1], zlib.decompress(row[2])
+    
+    def put_response(self, url, etag, last_modified, body):
+        """Store a response body with its validators"""
+        data = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, data, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, data, len(data), now, now)
+            )
+            self._db.commit()
+    
+    def touch_response(self, url):
+        """Mark a stored response as revalidated (the server answered 304)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._db.commit()
+            self.revalidated += 1
+    
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        with self._lock:
+            if self.ttl:
+                self._db.execute("DELETE FROM pages WHERE stored_at < ?", (time.time() - self.ttl,))
+                self._db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+            
+            if self.max_bytes:
+                total = self._db.execute(
+                    "SELECT (SELECT COALESCE(SUM(size), 0) FROM pages) + (SELECT COALESCE(SUM(size), 0) FROM responses)"
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._db.execute("""
+                        SELECT 'pages', page_id, version, size, accessed_at FROM pages
+                        UNION ALL
+                        SELECT 'responses', url, NULL, size, accessed_at FROM responses
+                        ORDER BY accessed_at
+                    """).fetchall()
+                    for table, key, version, size, _ in rows:
+                        if total <= self.max_bytes:
+                            break
+                        if table == 'pages':
+                            self._db.execute(
+                                "DELETE FROM pages WHERE page_id = ? AND version = ?", (key, version)
+                            )
+                        else:
+                            self._db.execute("DELETE FROM responses WHERE url = ?", (key,))
+                        total -= size
+            
+            self._db.commit()
+    
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._db.close()
+
+
+class SyncState:
+    """Manifest of the pages written to an output directory, used by incremental runs.
+    
+    Records page id, version, output filename and content hash for every page,
+    plus a key for the queries and mapping of the last successful run, its
+    start time and the latest page modification seen, in the server's time.
+    """
+    
+    MANIFEST_NAME = '.confluence-sync.json'
+    
+    def __init__(self, output_dir, log=print):
+        self.output_path = Path(output_dir)
+        self.manifest_path = self.output_path / self.MANIFEST_NAME
+        self.log = log  # progress output
+        self.query_key = None
+        self.last_run = None
+        self.modified_since = None  # latest version.when seen (Confluence server time)
+        self.pages = {}
+        self.deleted = {}
+        self.load()
+    
+    def load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            self.log(f"Ignoring unreadable sync manifest {self.manifest_path}: {e}")
+            return
+        
+        self.query_key = manifest.get('query_key')
+        if manifest.get('last_run'):
+            self.last_run = datetime.fromisoformat(manifest['last_run'])
+        if manifest.get('modified_since'):
+            self.modified_since = datetime.fromisoformat(manifest['modified_since'])
+        self.pages = manifest.get('pages', {})
+        self.deleted = manifest.get('deleted', {})
+    
+    def save(self, query_key, run_started):
+        """Write the manifest atomically (temp file + rename)"""
+        self.query_key = query_key
+        self.last_run = run_started
+        manifest = {
+            'query_key': self.query_key,
+            'last_run': self.last_run.isoformat(),
+            'modified_since': self.modified_since.isoformat() if self.modified_since else None,
+            'pages': self.pages,
+            'deleted': self.deleted
+        }
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def observe(self, page):
+        """Track the latest modification time of the search results, as reported by the server"""
+        when = page.get('version', {}).get('when')
+        if not when:
+            return
+        try:
+            modified = datetime.fromisoformat(when.replace('Z', '+00:00'))
+        except ValueError:
+            return
+        if modified.tzinfo is None:
+            return
+        if self.modified_since is None or modified > self.modified_since:
+            self.modified_since = modified
+    
+    def forget_versions(self):
+        """Make every page eligible for conversion again (files are still only rewritten if changed)"""
+        for entry in self.pages.values():
+            entry['version'] = None
+    
+    def is_current(self, page_id, version):
+        """True if this page version was already written and its file is intact"""
+        entry = self.pages.get(str(page_id))
+        if not entry or version is None or entry.get('version') != version:
+            return False
+        
+        file_path = self.output_path / entry['filename']
+        return file_path.exists() and self.file_hash(file_path) == entry.get('sha256')
+    
+    def is_unchanged(self, page_id, filename, content):
+        """True if the existing output file already holds this content (apart from the access date)"""
+        entry = self.pages.get(str(page_id))
+        if not entry or entry.get('filename') != filename:
+            return False
+        
+        file_path = self.output_path / filename
+        return file_path.exists() and entry.get('sha256') == self.content_hash(content)
+    
+    def record(self, page_id, version, filename, content, countries=(), year=None):
+        """Record a written page, removing its previous file if the title changed"""
+        page_id = str(page_id)
+        previous = self.pages.get(page_id)
+        if previous and previous.get('filename') != filename:
+            old_path = self.output_path / previous['filename']
+            if old_path.exists():
+                old_path.unlink()
+        
+        self.pages[page_id] = {
+            'version': version,
+            'filename': filename,
+            'sha256': self.content_hash(content),
+            'countries': list(countries),
+            'year': year
+        }
+        self.deleted.pop(page_id, None)
+    
+    def remove(self, page_id):
+        """Delete a page's output file and keep a tombstone in the manifest"""
+        page_id = str(page_id)
+        entry = self.pages.pop(page_id, None)
+        if not entry:
+            return None
+        
+        file_path = self.output_path / entry['filename']
+        if file_path.exists():
+            file_path.unlink()
+        
+        self.deleted[page_id] = {
+            'filename': entry['filename'],
+            'version': entry.get('version'),
+            'deleted_at': datetime.now().isoformat(timespec='seconds')
+        }
+        return file_path
+    
+    def aggregate(self):
+        """Per-country/per-year counts over every page in the manifest"""
+        aggregate = CitationAggregate()
+        for entry in self.pages.values():
+            aggregate.add(entry.get('countries', []), entry.get('year'))
+        return aggregate
+    
+    # The access date changes every day without the record changing
+    ACCESS_DATE_LINE = re.compile(r'^Y2  - .*\n?', re.MULTILINE)
+    
+    @classmethod
+    def content_hash(cls, content):
+        content = cls.ACCESS_DATE_LINE.sub('', content)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def file_hash(cls, file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return cls.content_hash(f.read())
+
+
+# File holding the raw JSON inside a --dump-raw directory
+RAW_DUMP_NAME = 'confluence-raw.jsonl.gz'
+
+
+class RawDumpWriter:
+    """Appends the raw search and page JSON of a run to a gzipped JSON lines file.
+    
+    Records are {"type": "run", "queries": ...}, {"type": "search", "cql": ...,
+    "response": ...} and {"type": "page", "id": ..., "response": ...}.
+    Several runs can be dumped into the same directory.
+    """
+    
+    def __init__(self, dump_dir):
+        self.path = Path(dump_dir) / RAW_DUMP_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    def _write(self, record):
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._file.write(line)
+    
+    def record_run(self, queries):
+        self._write({'type': 'run', 'queries': [[cql_query, list(tags)] for cql_query, tags in queries]})
+    
+    def record_search(self, cql_query, expand, response):
+        self._write({'type': 'search', 'cql': cql_query, 'expand': expand, 'response': response})
+    
+    def record_page(self, page_id, response):
+        self._write({'type': 'page', 'id': str(page_id), 'response': response})
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RawDumpReader:
+    """Serves searches and pages from a RawDumpWriter file instead of Confluence.
+    
+    Search results are merged per CQL query in the order first seen, keeping
+    the richest copy of each page (one with an expanded body wins).
+    """
+    
+    def __init__(self, dump_dir):
+        self.path = Path(dump_dir) / RAW_DUMP_NAME
+        self.queries = {}  # cql -> tags of the dumped runs, in order
+        self.searches = {}  # cql -> {page id: search result}
+        self.pages = {}  # page id -> page data
+        
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['type'] == 'run':
+                    for cql_query, tags in record['queries']:
+                        self.queries.setdefault(cql_query, tags)
+                elif record['type'] == 'search':
+                    results = self.searches.setdefault(record['cql'], {})
+                    for result in record['response'].get('results', []):
+                        previous = results.get(result['id'])
+                        if previous is None or (not previous.get('body') and result.get('body')):
+                            results[result['id']] = result
+                elif record['type'] == 'page':
+                    self.pages[record['id']] = record['response']
+    
+    def search(self, cql_query):
+        """All dumped results for a query, or None if the query was never dumped"""
+        results = self.searches.get(cql_query)
+        return list(results.values()) if results is not None else None
+    
+    def page(self, page_id):
+        """Full page data for an id, from a page fetch or a search with bodies"""
+        page_data = self.pages.get(str(page_id))
+        if page_data is None:
+            for results in self.searches.values():
+                result = results.get(str(page_id))
+                if result and result.get('body'):
+                    return result
+        return page_data
+
+
+class ZoteroSink:
+    """Pushes converted citations to a Zotero library through the Web API.
+    
+    Items are sent in write requests of up to BATCH_SIZE, uploaded by a small
+    thread pool (the same way pages are fetched) while conversion continues.
+    A state file maps page ids to Zotero item keys, versions and content
+    hashes: unchanged citations are not sent at all, and changed ones carry
+    their last known version, so Zotero rejects (412) an update to an item
+    that was edited there since and it is reported as a conflict instead.
+    """
+    
+    API_URL = 'https://api.zotero.org'
+    BATCH_SIZE = 50  # most items Zotero accepts per write request
+    
+    def __init__(self, library_id, api_key, library_type='group', state_file='data/cache/zotero-items.json',
+                 collection=None, concurrency=2, max_retries=3, retry_delay=5.0, api_url=API_URL, log=print):
+        if library_type not in ('group', 'user'):
+            raise ValueError(f"library_type must be 'group' or 'user', not '{library_type}'")
+        self.library = f"{library_type}s/{library_id}"
+        self.items_url = f"{api_url.rstrip('/')}/{self.library}/items"
+        self.collection = collection  # collection key new and updated items are filed in
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.state_path = Path(state_file)
+        self.log = log  # progress output
+        
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Zotero-API-Key': str(api_key),
+            'Zotero-API-Version': '3',
+            'Content-Type': 'application/json'
+        })
+        self.limiter = TokenBucket(0, concurrency)  # only paused, by Backoff/Retry-After
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._window = concurrency * 2  # batches in flight before add() waits
+        self._uploads = deque()
+        self._pending = []
+        self._lock = threading.Lock()
+        
+        self.library_version = None
+        self.items = {}  # page id -> {'key', 'version', 'sha256'}
+        self.counts = dict.fromkeys(('created', 'updated', 'unchanged', 'conflicts', 'failed', 'requests'), 0)
+        self.load()
+    
+    @classmethod
+    def from_config(cls, config, log=print):
+        """Build a sink from the 'zotero' section of confluence.yaml"""
+        if not config or not config.get('library_id') or not config.get('api_key'):
+            raise ValueError("the 'zotero' config section needs a library_id and an api_key")
+        options = ('library_type', 'state_file', 'collection', 'concurrency', 'max_retries', 'retry_delay',
+                   'api_url')
+        return cls(config['library_id'], config['api_key'], log=log,
+                   **{name: config[name] for name in options if config.get(name) is not None})
+    
+    def load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            self.log(f"Ignoring unreadable Zotero state {self.state_path}: {e}")
+            return
+        
+        # Keys from another library mean nothing here
+        if state.get('library') == self.library:
+            self.library_version = state.get('library_version')
+            self.items = state.get('items', {})
+    
+    def save(self):
+        """Write the state file atomically (temp file + rename); call with the lock held"""
+        state = {'library': self.library, 'library_version': self.library_version, 'items': self.items}
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+    
+    @staticmethod
+    def content_hash(item):
+        # The access date changes every run without the item changing
+        content = {name: value for name, value in item.items() if name != 'accessDate'}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def add(self, page_id, item):
+        """Queue a Zotero item for a page, unless Zotero already holds this content"""
+        page_id = str(page_id)
+        if self.collection:
+            item = dict(item, collections=[self.collection])
+        content_hash = self.content_hash(item)
+        
+        with self._lock:
+            entry = self.items.get(page_id)
+            if entry and entry.get('sha256') == content_hash:
+                self.counts['unchanged'] += 1
+                return
+        
+        if entry:
+            # Conditional write: rejected if the item changed in Zotero since
+            item = dict(item, key=entry['key'], version=entry['version'])
+        self._pending.append((page_id, item, content_hash))
+        if len(self._pending) >= self.BATCH_SIZE:
+            self.flush()
+    
+    def flush(self):
+        """Start uploading the queued items, waiting if too many batches are in flight"""
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self._uploads.append(self._executor.submit(self._upload, batch))
+        while len(self._uploads) > self._window:
+            self._uploads.popleft().result()
+    
+    def close(self):
+        """Upload whatever is queued, wait for every batch and save the state"""
+        self.flush()
+        while self._uploads:
+            self._uploads.popleft().result()
+        self._executor.shutdown()
+        self.session.close()
+        counts = self.counts
+        self.log(f"Zotero: {counts['created']} created, {counts['updated']} updated, "
+                 f"{counts['unchanged']} unchanged, {counts['conflicts']} conflicts, "
+                 f"{counts['failed']} failed ({counts['requests']} write requests)")
+    
+    def _post(self, batch):
+        """POST one batch, retrying 429/5xx and connection errors; returns the response or None"""
+        payload = json.dumps([item for _, item, _ in batch])
+        headers = {}
+        if all('key' not in item for _, item, _ in batch):
+            # Lets Zotero ignore a retried create that already went through
+            headers['Zotero-Write-Token'] = os.urandom(16).hex()
+        
+        for attempt in range(self.max_retries):
+            self.limiter.acquire()
+            try:
+                response = self.session.post(self.items_url, data=payload, headers=headers)
+            except requests.RequestException as e:
+                error = e
+                wait = None
+            else:
+                with self._lock:
+                    self.counts['requests'] += 1
+                backoff = _header_float(response.headers, 'Backoff')
+                if backoff:
+                    self.limiter.pause(backoff)
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                error = f"HTTP {response.status_code}"
+                wait = _header_float(response.headers, 'Retry-After')
+            
+            if attempt + 1 < self.max_retries:
+                delay = wait or self.retry_delay * 2 ** attempt
+                self.log(f"  Zotero upload failed ({error}), retrying in {delay:.1f}s")
+                self.limiter.pause(delay)
+            else:
+                self.log(f"  Zotero upload failed after {self.max_retries} attempts: {error}")
+        return None
+    
+    def _upload(self, batch):
+        response = self._post(batch)
+        if response is None or response.status_code != 200:
+            if response is not None:
+                self.log(f"  Zotero rejected a batch of {len(batch)} items: "
+                         f"HTTP {response.status_code} {response.text[:200]}")
+            with self._lock:
+                self.counts['failed'] += len(batch)
+            return
+        
+        result = response.json()
+        with self._lock:
+            library_version = response.headers.get('Last-Modified-Version')
+            if library_version and library_version.isdigit():
+                self.library_version = int(library_version)
+            
+            for index, (page_id, item, content_hash) in enumerate(batch):
+                index = str(index)
+                if index in result.get('successful', {}):
+                    written = result['successful'][index]
+                    self.counts['updated' if 'key' in item else 'created'] += 1
+                    self.items[page_id] = {'key': written['key'], 'version': written['version'],
+                                           'sha256': content_hash}
+                elif index in result.get('unchanged', {}):
+                    self.counts['unchanged'] += 1
+                    entry = self.items.get(page_id)
+                    if entry:
+                        entry['sha256'] = content_hash
+                else:
+                    failure = result.get('failed', {}).get(index, {})
+                    code = failure.get('code')
+                    if code == 412:
+                        self.counts['conflicts'] += 1
+                        self.log(f"  Zotero item {item.get('key')} (page {page_id}) was modified in Zotero, "
+                                 f"not overwriting it")
+                    else:
+                        self.counts['failed'] += 1
+                        self.log(f"  Zotero could not write page {page_id}: {failure.get('message', code)}")
+                        if code == 404:
+                            # Deleted in Zotero; create it again next time
+                            self.items.pop(page_id, None)
+            self.save()
+
+
+DEFAULT_FIELD_MAPPING = {
+    'type': 'STD',  # 'STD' for standards (Zotero compatible)
+    'date_formats': ['%B %Y', '%m/%Y', '%Y-%m-%d', '%Y'],
+    'fields': [
+        {'tag': 'TI', 'property': 'Initiative Name', 'fallback': 'title'},
+        {'tag': 'AU', 'property': 'Governing Organization'},
+        {'tag': 'PY', 'property': 'Initiative Start', 'transform': 'year'},
+        {'tag': 'DA', 'property': 'Initiative Start', 'transform': 'date'},
+        {'tag': 'PB', 'property': 'Governing Organization'},
+        {'tag': 'AB', 'transform': 'labeled', 'separator': '; ',
+         'properties': ['Method of Development', 'Adoption Status', 'Development Status']},
+        {'tag': 'KW', 'property': 'Type Labels', 'transform': 'split'},
+        {'tag': 'KW', 'property': 'Topic Labels', 'transform': 'split'},
+        {'tag': 'KW', 'property': 'Jurisdiction', 'transform': 'country'},
+        {'tag': 'KW', 'property': 'Region', 'transform': 'country'},
+        {'tag': 'KW', 'source': 'tags'},
+        {'tag': 'UR', 'property': 'External Links', 'transform': 'links'},
+        {'tag': 'UR', 'source': 'page_url'},
+        {'tag': 'Y2', 'source': 'access_date'}
+    ]
+}
+
+
+class PropertyCell:
+    """Value cell of a page properties table: its text and the link targets inside it"""
+    __slots__ = ('text', 'links')
+    
+    def __init__(self, text, links=()):
+        self.text = text
+        self.links = tuple(links)
+    
+    def __eq__(self, other):
+        return isinstance(other, PropertyCell) and (self.text, self.links) == (other.text, other.links)
+    
+    def __repr__(self):
+        return f"PropertyCell({self.text!r}, {self.links!r})"
+
+
+class PageRecord:
+    """The parts of a Confluence page the converter uses, without the rest of its JSON"""
+    __slots__ = ('id', 'title', 'version', 'body')
+    
+    def __init__(self, id, title, version=None, body=''):
+        self.id = id
+        self.title = title
+        self.version = version
+        self.body = body
+    
+    @classmethod
+    def from_json(cls, page_data):
+        """Build a record from a /rest/api/content response (or search result)"""
+        return cls(
+            sys.intern(str(page_data['id'])),
+            page_data.get('title', 'Unknown Title'),
+            page_data.get('version', {}).get('number'),
+            page_data.get('body', {}).get('view', {}).get('value', '')
+        )
+    
+    def __repr__(self):
+        return f"PageRecord(id={self.id!r}, title={self.title!r}, version={self.version!r})"
+
+
+class Citation:
+    """One converted page: its parsed properties and the rendered outputs"""
+    __slots__ = ('page_id', 'title', 'filename', 'properties', 'ris', 'csl_json')
+    
+    def __init__(self, page_id, title, filename, properties, ris, csl_json=None):
+        self.page_id = page_id
+        self.title = title
+        self.filename = filename
+        self.properties = properties  # property name -> PropertyCell
+        self.ris = ris
+        self.csl_json = csl_json
+    
+    def __repr__(self):
+        return f"Citation(page_id={self.page_id!r}, title={self.title!r})"
+
+
+class DateParser:
+    """Parse dates against a list of formats, trying the last matching format first"""
+    
+    def __init__(self, formats):
+        self.formats = list(formats)
+        self._detected = None
+    
+    def parse(self, date_str):
+        date_str = date_str.strip()
+        if self._detected:
+            try:
+                return datetime.strptime(date_str, self._detected)
+            except ValueError:
+                pass
+        
+        for fmt in self.formats:
+            if fmt == self._detected:
+                continue
+            try:
+                parsed = datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+            self._detected = fmt
+            return parsed
+        return None
+
+
+# RIS reference types and their CSL-JSON equivalents
+RIS_TO_CSL_TYPE = {
+    'STD': 'standard',
+    'JOUR': 'article-journal',
+    'BOOK': 'book',
+    'CHAP': 'chapter',
+    'RPRT': 'report',
+    'ELEC': 'webpage',
+    'GEN': 'document'
+}
+
+
+# RIS reference types and their Zotero item types
+RIS_TO_ZOTERO_TYPE = {
+    'STD': 'standard',
+    'JOUR': 'journalArticle',
+    'BOOK': 'book',
+    'CHAP': 'bookSection',
+    'RPRT': 'report',
+    'ELEC': 'webpage',
+    'GEN': 'document'
+}
+
+# Zotero field holding the RIS publisher (PB) for item types that don't call it 'publisher'
+ZOTERO_PUBLISHER_FIELD = {
+    'journalArticle': 'publicationTitle',
+    'report': 'institution',
+    'webpage': 'websiteTitle'
+}
+
+
+def _csl_date(value):
+    """Convert an RIS date ('YYYY/MM/DD' or 'YYYY') to CSL-JSON date-parts"""
+    parts = [int(part) for part in value.split('/') if part.strip().isdigit()]
+    return {'date-parts': [parts]} if parts else {'raw': value}
+
+
+class RISFieldMapping:
+    """Declarative mapping from page properties to RIS tags.
+    
+    Each entry of `fields` is compiled once into an emitter callable taking
+    (converter, page, properties, additional_tags) and returning the values
+    for that field, so converting a record is a single pass over the list. The
+    resulting (tag, value, kind) fields are rendered as RIS or CSL-JSON.
+    """
+    
+    TRANSFORMS = ('text', 'year', 'date', 'split', 'country', 'links', 'labeled')
+    SOURCES = ('tags', 'page_url', 'access_date')
+    
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError(f"expected a mapping with 'type' and 'fields', got {type(spec).__name__}")
+        self.spec = spec
+        self.type = spec.get('type', 'STD')
+        self.date_formats = spec.get('date_formats', DEFAULT_FIELD_MAPPING['date_formats'])
+        self.property_names = {}  # name -> interned name, so parsed keys share these strings
+        self.emitters = [self._compile(field) for field in spec.get('fields', [])]
+    
+    def __reduce__(self):
+        # Emitters are closures; rebuild them from the spec when unpickled
+        return (RISFieldMapping, (self.spec,))
+    
+    def fields(self, converter, page, properties, additional_tags=None):
+        """Return the (tag, value, kind) fields of one record in mapping order.
+        
+        `kind` is the transform or source that produced the value (e.g.
+        'country'), so other outputs can pick fields by meaning as well as tag.
+        """
+        fields = []
+        for tag, kind, emitter in self.emitters:
+            for value in emitter(converter, page, properties, additional_tags):
+                fields.append((tag, value, kind))
+        return fields
+    
+    def render_ris(self, fields):
+        """Render fields as one RIS record"""
+        ris_lines = [f"TY  - {self.type}"]
+        ris_lines.extend(f"{tag}  - {value}" for tag, value, kind in fields)
+        ris_lines.append("ER  - ")
+        return '\n'.join(ris_lines)
+    
+    def render_csl_json(self, page, fields):
+        """Render fields as a CSL-JSON item"""
+        item = {'id': page.id, 'type': RIS_TO_CSL_TYPE.get(self.type, 'document')}
+        keywords = []
+        urls = []
+        for tag, value, kind in fields:
+            if tag == 'TI':
+                item['title'] = value
+            elif tag == 'AU':
+                item.setdefault('author', []).append({'literal': value})
+            elif tag == 'PB':
+                item['publisher'] = value
+            elif tag == 'AB':
+                item['abstract'] = value
+            elif tag == 'DA':
+                item['issued'] = _csl_date(value)
+            elif tag == 'PY':
+                item.setdefault('issued', _csl_date(value))
+            elif tag == 'Y2':
+                item['accessed'] = _csl_date(value)
+            elif tag == 'KW':
+                keywords.append(value)
+            elif tag == 'UR':
+                urls.append(value)
+        
+        if keywords:
+            item['keyword'] = ', '.join(keywords)
+        if urls:
+            item['URL'] = urls[0]
+            if len(urls) > 1:
+                item['note'] = '\n'.join(urls[1:])
+        return item
+    
+    def render_zotero(self, page, fields):
+        """Render fields as a Zotero Web API item (without key or version)"""
+        item_type = RIS_TO_ZOTERO_TYPE.get(self.type, 'document')
+        item = {'itemType': item_type, 'creators': [], 'tags': []}
+        keywords = []
+        urls = []
+        for tag, value, kind in fields:
+            if tag == 'TI':
+                item['title'] = value
+            elif tag == 'AU':
+                item['creators'].append({'creatorType': 'author', 'name': value})
+            elif tag == 'PB':
+                item[ZOTERO_PUBLISHER_FIELD.get(item_type, 'publisher')] = value
+            elif tag == 'AB':
+                item['abstractNote'] = value
+            elif tag == 'DA':
+                item['date'] = value.replace('/', '-')
+            elif tag == 'PY':
+                item.setdefault('date', value)
+            elif tag == 'Y2':
+                item['accessDate'] = value.replace('/', '-')
+            elif tag == 'KW' and value not in keywords:
+                keywords.append(value)
+            elif tag == 'UR':
+                urls.append(value)
+        
+        item['tags'] = [{'tag': keyword} for keyword in keywords]
+        if urls:
+            item['url'] = urls[0]
+            if len(urls) > 1:
+                item['extra'] = '\n'.join(urls[1:])
+        return item
+    
+    def _compile(self, field):
+        tag = field.get('tag')
+        if not tag:
+            raise ValueError(f"Field mapping entry without a tag: {field}")
+        
+        source = field.get('source')
+        if source:
+            return tag, source, self._compile_source(tag, source)
+        
+        transform = field.get('transform', 'text')
+        if transform not in self.TRANSFORMS:
+            raise ValueError(f"Unknown transform '{transform}' for tag {tag}")
+        
+        return tag, transform, self._compile_transform(tag, transform, field)
+    
+    def _compile_transform(self, tag, transform, field):
+        if transform == 'labeled':
+            names = [self._property_name(name) for name in field.get('properties', [])]
+            separator = field.get('separator', '; ')
+            
+            def emit_labeled(converter, page, properties, additional_tags):
+                parts = [f"{name}: {properties[name].text}" for name in names if name in properties]
+                return [separator.join(parts)] if parts else ()
+            return emit_labeled
+        
+        name = field.get('property')
+        if not name:
+            raise ValueError(f"Field mapping entry for tag {tag} needs a 'property'")
+        name = self._property_name(name)
+        
+        if transform == 'text':
+            fallback = field.get('fallback')
+            
+            def emit_text(converter, page, properties, additional_tags):
+                value = properties[name].text if name in properties else None
+                if not value and fallback == 'title':
+                    value = page.title
+                return [value] if value is not None else ()
+            return emit_text
+        
+        if transform in ('year', 'date'):
+            date_parser = DateParser(self.date_formats)
+            
+            def emit_date(converter, page, properties, additional_tags):
+                if name not in properties:
+                    return ()
+                parsed = date_parser.parse(properties[name].text)
+                if not parsed:
+                    return ()
+                if transform == 'year':
+                    return [str(parsed.year)]
+                return [parsed.strftime('%Y/%m/%d')]
+            return emit_date
+        
+        if transform == 'split':
+            separator = field.get('separator', ',')
+            
+            def emit_split(converter, page, properties, additional_tags):
+                if name not in properties:
+                    return ()
+                items = properties[name].text.split(separator)
+                return [item.strip() for item in items if item.strip()]
+            return emit_split
+        
+        if transform == 'country':
+            def emit_country(converter, page, properties, additional_tags):
+                if name not in properties:
+                    return ()
+                return converter.normalize_country_names(properties[name].text)
+            return emit_country
+        
+        # transform == 'links'
+        def emit_links(converter, page, properties, additional_tags):
+            cell = properties.get(name)
+            return cell.links if cell else ()
+        return emit_links
+    
+    def _property_name(self, name):
+        name = sys.intern(name)
+        self.property_names[name] = name
+        return name
+    
+    def _compile_source(self, tag, source):
+        if source not in self.SOURCES:
+            raise ValueError(f"Unknown source '{source}' for tag {tag}")
+        
+        if source == 'tags':
+            def emit_tags(converter, page, properties, additional_tags):
+                return [extra for extra in additional_tags or () if extra]
+            return emit_tags
+        
+        if source == 'page_url':
+            def emit_page_url(converter, page, properties, additional_tags):
+                return [f"{converter.base_url}/pages/viewpage.action?pageId={page.id}"]
+            return emit_page_url
+        
+        # source == 'access_date'
+        def emit_access_date(converter, page, properties, additional_tags):
+            return [converter.get_access_date()]
+        return emit_access_date
+
+
+class CitationAggregate:
+    """Per-country and per-year citation counts in the zotero-viz cache layout"""
+    
+    def __init__(self):
+        self.map = {}
+        self.timeline = {}
+        self.item_count = 0
+    
+    @staticmethod
+    def summarize(fields):
+        """Return (countries, year) for one record's fields"""
+        countries = []
+        year = None
+        for tag, value, kind in fields:
+            if kind == 'country' and value not in countries:
+                countries.append(value)
+            elif tag == 'PY' and year is None:
+                year = value
+        return countries, year
+    
+    def add(self, countries, year):
+        self.item_count += 1
+        for country in countries:
+            self.map[country] = self.map.get(country, 0) + 1
+        if year:
+            self.timeline[year] = self.timeline.get(year, 0) + 1
+    
+    def counts(self):
+        return {'map': self.map, 'timeline': self.timeline, 'item_count': self.item_count}
+    
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.map = dict(data.get('map', {}))
+        aggregate.timeline = dict(data.get('timeline', {}))
+        aggregate.item_count = data.get('item_count', 0)
+        return aggregate
+    
+    def to_dict(self):
+        return {
+            'map': dict(sorted(self.map.items())),
+            'timeline': dict(sorted(self.timeline.items())),
+            'updated': int(time.time()),
+            'item_count': self.item_count
+        }
+    
+    def save(self, path):
+        """Write the aggregate atomically (temp file + rename)"""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Alias data shared with the WordPress visualization plugin
+DEFAULT_COUNTRY_MAPPINGS = Path(__file__).resolve().parent.parent / 'zotero-viz' / 'assets' / 'country-mappings.json'
+
+
+class CountryIndex:
+    """Case-folded, whitespace-normalized index of country/region aliases.
+    
+    Built once from alias -> standard name tables; lookups are a single dict
+    hit and are memoized per raw input string.
+    """
+    
+    def __init__(self):
+        self._index = {}
+        self._memo = {}
+    
+    @staticmethod
+    def fold(name):
+        return ' '.join(name.split()).casefold()
+    
+    def add_aliases(self, aliases, override=True):
+        """Add alias -> standard name pairs; standard names also map to themselves"""
+        for alias, standard in aliases.items():
+            for name in (standard, alias):
+                key = self.fold(name)
+                if override or key not in self._index:
+                    self._index[key] = standard
+        self._memo.clear()
+    
+    def resolve_targets(self, aliases):
+        """Send every entry pointing at an alias in `aliases` on to that alias's standard name"""
+        for key, standard in self._index.items():
+            self._index[key] = aliases.get(standard, standard)
+        self._memo.clear()
+    
+    def lookup(self, name):
+        """Return the standard name for `name`, or None if it is not known"""
+        try:
+            return self._memo[name]
+        except KeyError:
+            standard = self._index.get(self.fold(name))
+            self._memo[name] = standard
+            return standard
+
+
+class ConfigError(ValueError):
+    """The config file, field mapping or country mappings cannot be used"""
+
+
+# Converter copy used by parse/convert worker processes
+_worker_converter = None
+
+
+def _init_parse_worker(converter):
+    global _worker_converter
+    _worker_converter = converter
+
+
+def _parse_and_convert_worker(page, additional_tags):
+    return _worker_converter.parse_and_convert_timed(page, additional_tags)
+
+
+class ConfluenceRISConverter:
+    def __init__(self, config_path="data/config/confluence.yaml", verbose=True):
+        self.verbose = verbose  # print progress messages (see log)
+        self.config = self.load_config(config_path)
+        self.field_mapping = self.load_field_mapping(config_path)
+        self.access_date = None  # set once per run by process_pages_cql
+        self.base_url = self.config.get('base_url', 'https://confluence.hl7.org')
+        self.session = requests.Session()
+        
+        # HTTP connection settings
+        self.http_pool_size = self.config.get('http_pool_size')  # connections kept per host (default: max(10, concurrency))
+        self.http_keep_alive = self.config.get('http_keep_alive', True)
+        self.conditional_requests = self.config.get('conditional_requests', True)  # revalidate cached responses
+        
+        # Rate limiting settings (one token bucket shared by all workers)
+        rate_limit_delay = self.config.get('rate_limit_delay', 1.0)  # seconds between requests
+        rate_limit_burst = self.config.get('rate_limit_burst', 1)  # requests allowed back to back
+        if self.config.get('adaptive_rate_limit', True):
+            # Speeds up while responses are fast, backs off on 429/5xx
+            self.rate_limiter = AdaptiveRateLimiter(
+                rate_limit_delay, rate_limit_burst,
+                min_interval=self.config.get('rate_limit_min_delay'),  # fastest allowed spacing (default: rate_limit_delay)
+                max_interval=self.config.get('rate_limit_max_delay', 30.0)  # slowest spacing after backoff
+            )
+        else:
+            self.rate_limiter = TokenBucket(rate_limit_delay, rate_limit_burst)
+        self.rate_limiter.log = self.log
+        self.concurrency = self.config.get('concurrency', 1)  # parallel page fetches
+        self.parse_workers = self.config.get('parse_workers', 1)  # processes for parsing/conversion
+        self.output_formats = self.config.get('output_formats', ['ris'])  # see CitationWriter.FORMATS
+        self.checkpoint_interval = self.config.get('checkpoint_interval', 25)  # pages between checkpoints (0 = off)
+        self.max_retries = self.config.get('max_retries', 3)
+        self.retry_delay = self.config.get('retry_delay', 5.0)  # base of the exponential retry backoff
+        self.retry_max_delay = self.config.get('retry_max_delay', 60.0)  # longest wait between retries
+        
+        # Request counters and per-stage timings (JSON lines or .prom textfile if metrics_file is set)
+        self.metrics = RunMetrics(self.config.get('metrics_file'))
+        
+        # Search pagination settings
+        self.search_page_size = self.config.get('search_page_size', 100)  # results per search request
+        self.last_search_total = None  # totalSize reported by the server for the last search
+        self.last_combined_path = None  # combined RIS file written by the last run
+        
+        # Request page bodies with the search itself instead of one fetch per page
+        self.search_expand_body = self.config.get('search_expand_body', True)
+        
+        # Raw JSON dump of searches/pages (RawDumpWriter) and offline replay (RawDumpReader)
+        self.raw_dump = None
+        self.replay = None
+        
+        # Zotero library every converted citation is pushed to (ZoteroSink)
+        self.zotero = None
+        
+        # On-disk page cache (opened lazily; set cache_dir to None to disable)
+        self.cache_dir = self.config.get('cache_dir', 'data/cache')
+        self.cache_ttl_days = self.config.get('cache_ttl_days', 30)
+        self.cache_max_mb = self.config.get('cache_max_mb', 500)
+        self._cache = None
+        
+        # HTML parser backend for the properties table: 'stream' or 'bs4'
+        self.html_parser = self.config.get('html_parser', 'stream')
+        
+        # Incremental sync: widen the lastmodified window to absorb clock/timezone skew
+        self.incremental_overlap_minutes = self.config.get('incremental_overlap_minutes', 60)
+        
+        # Country/region name transformations to World Bank standard names
+        self.country_transformations = {
+            'UK': 'United Kingdom',
+            'United States': 'United States',
+            'US': 'United States',
+            'USA': 'United States',
+            'Canada': 'Canada',
+            'Australia': 'Australia',
+            'New Zealand': 'New Zealand',
+            'Germany': 'Germany',
+            'France': 'France',
+            'Netherlands': 'Netherlands',
+            'Belgium': 'Belgium',
+            'Switzerland': 'Switzerland',
+            'Austria': 'Austria',
+            'Denmark': 'Denmark',
+            'Sweden': 'Sweden',
+            'Norway': 'Norway',
+            'Finland': 'Finland',
+            'Japan': 'Japan',
+            'South Korea': 'Korea, Rep.',
+            'Brazil': 'Brazil',
+            'Argentina': 'Argentina',
+            'Chile': 'Chile',
+            'Mexico': 'Mexico',
+            'Spain': 'Spain',
+            'Italy': 'Italy',
+            'Portugal': 'Portugal',
+            'Ireland': 'Ireland',
+            'Scotland': 'United Kingdom',
+            'Wales': 'United Kingdom',
+            'England': 'United Kingdom',
+            'Northern Ireland': 'United Kingdom'
+        }
+        self.country_index = self.build_country_index(config_path)
+        self.unmapped_countries = set()  # reported once per run
+        self._found_unmapped = set()  # met since the last conversion result was collected
+        
+        # Set bearer token authentication
+        token = self.config.get('bearer_token')
+        if token:
+            self.session.headers.update({"Authorization": f"Bearer {token}"})
+        self.configure_http()
+    
+    @property
+    def rate_limit_delay(self):
+        """Seconds between requests enforced by the shared rate limiter"""
+        return self.rate_limiter.interval
+    
+    @rate_limit_delay.setter
+    def rate_limit_delay(self, value):
+        self.rate_limiter.reset(value)
+    
+    def log(self, message):
+        """Print a progress message unless the converter is quiet (verbose=False)"""
+        if self.verbose:
+            print(message)
+    
+    def __getstate__(self):
+        """Picklable state for worker processes (no HTTP session, rate limiter, cache or metrics)"""
+        state = self.__dict__.copy()
+        for name in ('session', 'rate_limiter', '_cache', 'metrics', 'raw_dump', 'replay', 'zotero'):
+            state[name] = None
+        return state
+    
+    @property
+    def cache(self):
+        """The on-disk page cache, or None when caching is disabled"""
+        if self._cache is None and self.cache_dir:
+            self._cache = PageCache(
+                self.cache_dir,
+                ttl=self.cache_ttl_days * 86400 if self.cache_ttl_days else None,
+                max_bytes=int(self.cache_max_mb * 1024 * 1024) if self.cache_max_mb else None
+            )
+        return self._cache
+    
+    def close(self):
+        """Release resources held by the converter (HTTP session, page cache, dump and metrics files).
+        
+        Citations still queued for Zotero are uploaded first.
+        """
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self.raw_dump is not None:
+            self.raw_dump.close()
+            self.raw_dump = None
+        if self.zotero is not None:
+            self.zotero.close()
+            self.zotero = None
+        self.session.close()
+        self.metrics.set_gauge('request_rate', self.rate_limiter.rate)
+        self.metrics.close()
+    
+    def configure_http(self):
+        """Size the connection pool, set keep-alive and ask for compressed responses"""
+        pool_size = self.http_pool_size or max(10, self.concurrency)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        if self.http_keep_alive:
+            self.session.headers.pop('Connection', None)
+        else:
+            self.session.headers['Connection'] = 'close'
+    
+    def retry_backoff(self, attempt):
+        """Jittered exponential delay before retry number `attempt` + 1"""
+        delay = min(self.retry_max_delay, self.retry_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    def _make_request_with_retry(self, url, params=None, stage='fetch', headers=None):
+        """Make HTTP request with rate limiting and retry logic.
+        
+        Each attempt's latency is recorded under `stage` ('search' or 'fetch').
+        """
+        for attempt in range(self.max_retries):
+            if attempt:
+                self.metrics.count('retries')
+            try:
+                # Rate limiting - wait for a token from the shared bucket
+                waited = self.rate_limiter.acquire()
+                if waited > 0:
+                    self.metrics.count('throttle_seconds', waited)
+                    self.log(f"  Rate limiting: waited {waited:.1f}s")
+                
+                self.metrics.count('requests')
+                started = time.perf_counter()
+                response = self.session.get(url, params=params, headers=headers)
+                size = len(response.content)
+                self.metrics.count('bytes_downloaded', size)
+                # Bytes read from the socket (before decompression)
+                raw_tell = getattr(response.raw, 'tell', None)
+                self.metrics.count('bytes_transferred', raw_tell() if raw_tell else size)
+                if response.headers.get('Content-Encoding'):
+                    self.metrics.count('compressed')
+                latency = time.perf_counter() - started
+                self.metrics.observe(stage, latency, status=response.status_code, bytes=size)
+                self.rate_limiter.record_response(response.status_code, latency, response.headers)
+                
+                if response.status_code == 429:
+                    self.metrics.count('rate_limited')
+                    # Rate limited - wait for Retry-After (or back off) and retry
+                    retry_after = _header_float(response.headers, 'Retry-After')
+                    if retry_after is None:
+                        retry_after = self.retry_backoff(attempt)
+                    
+                    # Pause every worker, not just this one
+                    self.log(f"  Rate limited (429), waiting {retry_after:.1f}s before retry "
+                             f"{attempt + 1}/{self.max_retries}...")
+                    self.rate_limiter.pause(retry_after)
+                    continue
+                
+                response.raise_for_status()
+                return response
+                
+            except requests.RequestException as e:
+                self.metrics.count('errors')
+                if attempt == self.max_retries - 1:
+                    # Last attempt failed
+                    raise e
+                else:
+                    delay = self.retry_backoff(attempt)
+                    self.log(f"  Request failed (attempt {attempt + 1}/{self.max_retries}), "
+                             f"retrying in {delay:.1f}s: {e}")
+                    self.metrics.count('backoff_seconds', delay)
+                    time.sleep(delay)
+    
+    def _get_json(self, url, params=None, stage='fetch'):
+        """GET a JSON resource, revalidating a stored copy with a conditional request.
+        
+        When the cache holds an earlier response with an ETag or Last-Modified,
+        If-None-Match / If-Modified-Since are sent and a 304 reuses the stored body.
+        """
+        cache = self.cache if self.conditional_requests else None
+        key = url + ('?' + urlencode(sorted(params.items())) if params else '')
+        stored = cache.get_response(key) if cache else None
+        
+        headers = {}
+        if stored:
+            etag, last_modified, _ = stored
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        response = self._make_request_with_retry(url, params, stage, headers)
+        if not response:
+            return None
+        
+        if response.status_code == 304 and stored:
+            self.metrics.count('not_modified')
+            cache.touch_response(key)
+            return json.loads(stored[2])
+        
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if cache and (etag or last_modified):
+            cache.put_response(key, etag, last_modified, response.content)
+        return response.json()
+    
+    def load_config(self, config_path):
+        """Load configuration from YAML file (raises ConfigError)"""
+        try:
+            with open(config_path, 'r') as file:
+                config = yaml.safe_load(file)
+        except FileNotFoundError:
+            raise ConfigError(f"Config file not found: {config_path}\n"
+                              "Please create a config file with 'base_url' and 'bearer_token'") from None
+        except yaml.YAMLError as e:
+            raise ConfigError(f"Error parsing config file: {e}") from None
+        
+        if config is None:
+            return {}
+        if not isinstance(config, dict):
+            raise ConfigError(f"Config file {config_path} must hold a mapping of settings")
+        return config
+    
+    def load_field_mapping(self, config_path):
+        """Load the RIS field mapping that sits next to the config file, if any"""
+        mapping_path = Path(config_path).parent / self.config.get('field_mapping', 'ris_mapping.yaml')
+        spec = DEFAULT_FIELD_MAPPING
+        if mapping_path.exists():
+            try:
+                with open(mapping_path, 'r') as file:
+                    # An empty (or comment-only) file keeps the default mapping
+                    spec = yaml.safe_load(file)
+                if spec is None:
+                    spec = DEFAULT_FIELD_MAPPING
+            except yaml.YAMLError as e:
+                raise ConfigError(f"Error parsing field mapping file: {e}") from None
+        
+        try:
+            return RISFieldMapping(spec)
+        except ValueError as e:
+            raise ConfigError(f"Invalid field mapping in {mapping_path}: {e}") from None
+    
+    def build_country_index(self, config_path):
+        """Index the built-in transformations plus the shared country-mappings.json aliases"""
+        index = CountryIndex()
+        
+        configured = self.config.get('country_mappings')
+        mappings_path = DEFAULT_COUNTRY_MAPPINGS
+        if configured:
+            mappings_path = Path(config_path).parent / configured
+        
+        try:
+            with open(mappings_path, 'r', encoding='utf-8') as file:
+                index.add_aliases(json.load(file))
+        except FileNotFoundError:
+            if configured:
+                raise ConfigError(f"Country mappings file not found: {mappings_path}") from None
+            # Outside a checkout of the repository (e.g. an installed package) the
+            # shared file is not next to this module and must be configured
+            self.log(f"Warning: {mappings_path} not found, only built-in country names are normalized; "
+                     f"set country_mappings in the config to the zotero-viz country-mappings.json")
+        except (json.JSONDecodeError, OSError) as e:
+            self.log(f"Ignoring unreadable country mappings {mappings_path}: {e}")
+        
+        # Built-in transformations take precedence, and shared aliases that
+        # point at one of their keys follow it (e.g. KOR -> South Korea -> Korea, Rep.)
+        index.add_aliases(self.country_transformations)
+        index.resolve_targets(self.country_transformations)
+        return index
+    
+    def get_access_date(self):
+        """Access date stamped on citations (fixed for the duration of a run)"""
+        return self.access_date or datetime.now().strftime('%Y/%m/%d')
+    
+    def search_pages_cql(self, cql_query, start=0, limit=None, expand=None):
+        """Search for pages using raw CQL query (single page of results)"""
+        if expand is None:
+            expand = "body.view,metadata.labels,space,version" if self.search_expand_body else "metadata.labels,version"
+        
+        url = f"{self.base_url}/rest/api/content/search"
+        params = {
+            "cql": cql_query,
+            "expand": expand,
+            "start": start,
+            "limit": limit or self.search_page_size
+        }
+        
+        try:
+            return self._get_json(url, params, stage='search')
+        except requests.RequestException as e:
+            self.log(f"Error searching pages with CQL '{cql_query}': {e}")
+            return None
+    
+    def iter_search_pages_cql(self, cql_query, page_size=None, expand=None, start=0):
+        """Yield search results one at a time, following pagination until exhausted.
+        
+        Only one page of search results is held in memory at a time, so callers
+        can start processing before the search has finished.
+        """
+        page_size = page_size or self.search_page_size
+        self.last_search_total = None
+        next_url = None
+        
+        if self.replay:
+            yield from self._iter_replayed_search(cql_query, start)
+            return
+        
+        while True:
+            if next_url:
+                try:
+                    search_results = self._get_json(next_url, stage='search')
+                except requests.RequestException as e:
+                    self.log(f"Error fetching next search page '{next_url}': {e}")
+                    return
+            else:
+                search_results = self.search_pages_cql(cql_query, start=start, limit=page_size, expand=expand)
+            
+            if not search_results:
+                return
+            
+            if self.raw_dump:
+                self.raw_dump.record_search(cql_query, expand, search_results)
+            
+            if self.last_search_total is None and 'totalSize' in search_results:
+                self.last_search_total = search_results['totalSize']
+                self.log(f"Search reports {self.last_search_total} matching pages")
+            
+            results = search_results.get('results', [])
+            for result in results:
+                yield result
+            
+            if not results:
+                return
+            
+            # Prefer the server-provided next link; fall back to start offsets
+            links = search_results.get('_links', {})
+            if links.get('next'):
+                # 'base' already includes any context path
+                next_url = links.get('base', self.base_url).rstrip('/') + links['next']
+                continue
+            
+            next_url = None
+            start = search_results.get('start', start) + len(results)
+            total = search_results.get('totalSize')
+            if total is not None:
+                if start >= total:
+                    return
+            elif len(results) < search_results.get('limit', page_size):
+                return
+    
+    def _iter_replayed_search(self, cql_query, start=0):
+        results = self.replay.search(cql_query)
+        if results is None:
+            self.log(f"Query not found in the dump: {cql_query}")
+            return
+        self.last_search_total = len(results)
+        self.log(f"Dump holds {self.last_search_total} matching pages")
+        yield from results[start:]
+    
+    def iter_search_queries(self, queries, start=0):
+        """Yield (search result, tags) for the union of several (cql, tags) queries.
+        
+        A page matching more than one query is yielded once, with the tags of
+        every query it matches. Later queries are first listed by id (a search
+        without bodies) so each page's tags are complete when it is yielded.
+        `start` skips that many results of the merged stream.
+        """
+        if len(queries) == 1:
+            cql_query, tags = queries[0]
+            self.log(f"Searching with CQL: {cql_query}")
+            for page in self.iter_search_pages_cql(cql_query, start=start):
+                yield page, list(tags)
+            return
+        
+        later_ids = []
+        for cql_query, _ in queries[1:]:
+            self.log(f"Listing pages for CQL: {cql_query}")
+            later_ids.append({page['id'] for page in self.iter_search_pages_cql(cql_query, expand='')})
+        
+        def merged():
+            seen = set()
+            for index, (cql_query, tags) in enumerate(queries):
+                self.log(f"Searching with CQL: {cql_query}")
+                for page in self.iter_search_pages_cql(cql_query):
+                    if page['id'] in seen:
+                        continue
+                    seen.add(page['id'])
+                    
+                    page_tags = list(tags)
+                    for (_, other_tags), ids in zip(queries[index + 1:], later_ids[index:]):
+                        if page['id'] in ids:
+                            page_tags.extend(tag for tag in other_tags if tag not in page_tags)
+                    yield page, page_tags
+        
+        yield from itertools.islice(merged(), start, None)
+    
+    def has_body_view(self, page_data):
+        """Check whether page data already carries expanded body.view content"""
+        return bool(page_data.get('body', {}).get('view', {}).get('value'))
+    
+    def page_version(self, page_data):
+        """Return the page's version number if the response included it"""
+        return page_data.get('version', {}).get('number')
+    
+    def get_page_content(self, page_id, version=None):
+        """Get page content with body.view expansion, using the cache when the version is known"""
+        if self.replay:
+            page_data = self.replay.page(page_id)
+            if page_data is None:
+                self.log(f"Page {page_id} not found in the dump")
+            return page_data
+        
+        if self.cache and version is not None:
+            cached = self.cache.get(page_id, version)
+            if cached:
+                return self._dumped_page(page_id, cached)
+        
+        url = f"{self.base_url}/rest/api/content/{page_id}"
+        params = {"expand": "body.view,metadata.labels,space,version"}
+        
+        try:
+            page_data = self._get_json(url, params)
+        except requests.RequestException as e:
+            self.log(f"Error getting page {page_id}: {e}")
+            return None
+        
+        if page_data and self.cache:
+            self.cache.put(page_id, self.page_version(page_data), page_data)
+        return self._dumped_page(page_id, page_data)
+    
+    def _dumped_page(self, page_id, page_data):
+        """Add page data that did not come with a search result to the raw dump"""
+        if self.raw_dump and page_data:
+            self.raw_dump.record_page(page_id, page_data)
+        return page_data
+    
+    def _local_page_data(self, page):
+        """Return full page data available without a request (search body or cache hit).
+        
+        Bodies expanded by the search are not copied into the page cache: the
+        search response itself is kept for revalidation, and the page cache
+        only serves the per-page fetch path.
+        """
+        if self.has_body_view(page):
+            return page
+        
+        if self.cache:
+            return self._dumped_page(page['id'], self.cache.get(page['id'], self.page_version(page)))
+        return None
+    
+    def iter_page_data(self, pages):
+        """Yield (search result, full page data) pairs in search order.
+        
+        Results that already carry a body or are cached at the same version are
+        passed through; the rest are fetched with get_page_content, concurrently
+        when `concurrency` is above 1. Output order always matches input order.
+        """
+        if self.concurrency <= 1:
+            for page in pages:
+                page_data = self._local_page_data(page)
+                if page_data is None:
+                    page_data = self.get_page_content(page['id'])
+                yield page, page_data
+            return
+        
+        # Bounded look-ahead window so memory stays flat on large searches
+        window = self.concurrency * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for page in pages:
+                page_data = self._local_page_data(page)
+                if page_data is not None:
+                    pending.append((page, page_data))
+                else:
+                    pending.append((page, executor.submit(self.get_page_content, page['id'])))
+                
+                while len(pending) > window:
+                    yield self._resolve_pending(pending.popleft())
+            
+            while pending:
+                yield self._resolve_pending(pending.popleft())
+    
+    def _resolve_pending(self, item):
+        page, result = item
+        if isinstance(result, Future):
+            return page, result.result()
+        return page, result
+    
+    def parse_html_table(self, html_content):
+        """Parse HTML table from Confluence page properties into {name: PropertyCell}"""
+        if self.html_parser == 'bs4':
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(html_content, 'html.parser')
+            
+            # Find the table (usually in a details macro or direct table)
+            table = soup.find('table')
+        else:
+            # Only the first table is parsed; the rest of the page is skipped
+            table = PropertiesTableExtractor().extract(html_content)
+        
+        if not table:
+            return {}
+        
+        properties = {}
+        rows = table.find_all('tr')
+        
+        for row in rows:
+            cells = row.find_all(['th', 'td'])
+            if len(cells) >= 2:
+                # Mapped property names come back as the mapping's own string; others are not interned
+                key = cells[0].get_text(strip=True)
+                key = self.field_mapping.property_names.get(key, key)
+                properties[key] = self._extract_cell_value(cells[1])
+        
+        return properties
+    
+    def _extract_cell_value(self, cell):
+        """Extract a PropertyCell (text plus any link targets) from a table cell"""
+        # Get all text content
+        text_content = cell.get_text(separator='\n', strip=True)
+        
+        # Also extract links for reference
+        links = [link.attrs['href'] for link in cell.find_all('a') if link.attrs.get('href') is not None]
+        return PropertyCell(text_content, links)
+    
+    def normalize_country_name(self, country_name):
+        """Transform country/region names to World Bank standard names"""
+        if not country_name:
+            return country_name
+        
+        return self.country_index.lookup(country_name)
+    
+    def normalize_country_names(self, value):
+        """Normalize a Jurisdiction/Region cell that may list several names.
+        
+        The whole cell is tried first (names such as 'Korea, Rep.' contain a
+        comma), then each comma- or newline-separated part. Unknown names are
+        left out and returned by parse_and_convert_timed, to be reported once
+        per run by the parent process.
+        """
+        value = value.strip()
+        if not value:
+            return []
+        
+        standard = self.normalize_country_name(value)
+        if standard:
+            return [standard]
+        
+        names = []
+        for part in re.split(r'[,\n]', value):
+            part = part.strip()
+            if not part:
+                continue
+            standard = self.normalize_country_name(part)
+            if standard:
+                if standard not in names:
+                    names.append(standard)
+            else:
+                self._found_unmapped.add(part)
+        return names
+    
+    def sanitize_filename(self, title):
+        """Convert page title to lowercase filename-safe string"""
+        # Convert to lowercase
+        filename = title.lower()
+        
+        # Replace spaces and special characters with underscores
+        filename = re.sub(r'[^\w\-_.]', '_', filename)
+        
+        # Remove multiple consecutive underscores
+        filename = re.sub(r'_+', '_', filename)
+        
+        # Remove leading/trailing underscores
+        filename = filename.strip('_')
+        
+        return filename
+    
+    def convert_to_fields(self, page, properties, additional_tags=None):
+        """Map a PageRecord's properties to (tag, value, kind) citation fields"""
+        return self.field_mapping.fields(self, page, properties, additional_tags)
+    
+    def convert_to_ris(self, page, properties, additional_tags=None):
+        """Convert page properties to RIS citation format using the field mapping"""
+        return self.field_mapping.render_ris(self.convert_to_fields(page, properties, additional_tags))
+    
+    def convert_to_csl_json(self, page, properties, additional_tags=None):
+        """Convert page properties to a CSL-JSON item using the field mapping"""
+        fields = self.convert_to_fields(page, properties, additional_tags)
+        return self.field_mapping.render_csl_json(page, fields)
+    
+    def parse_and_convert(self, page, additional_tags=None):
+        """Parse the properties table of a PageRecord and map it to citation fields.
+        
+        Returns (properties, fields, error); on failure the first two are None
+        and error describes why.
+        """
+        result, timings, unmapped = self.parse_and_convert_timed(page, additional_tags)
+        self._record_conversion(timings, unmapped)
+        return result
+    
+    def parse_and_convert_timed(self, page, additional_tags=None):
+        """parse_and_convert without touching the metrics or the log (safe in worker processes).
+        
+        Returns ((properties, fields, error), timings, unmapped) where timings
+        is a list of (stage, seconds) and unmapped the country/region names
+        that could not be mapped, for the parent process to record.
+        """
+        timings = []
+        if not page.body:
+            return (None, None, f"No body content found for page {page.id}"), timings, []
+        
+        # Parse properties from HTML table
+        started = time.perf_counter()
+        properties = self.parse_html_table(page.body)
+        timings.append(('parse', time.perf_counter() - started))
+        if not properties:
+            return (None, None, f"No properties table found for page {page.id}"), timings, []
+        
+        # Map to citation fields (rendered as RIS/CSL-JSON by the output stage)
+        started = time.perf_counter()
+        fields = self.convert_to_fields(page, properties, additional_tags)
+        timings.append(('convert', time.perf_counter() - started))
+        unmapped = sorted(self._found_unmapped)
+        self._found_unmapped.clear()
+        return (properties, fields, None), timings, unmapped
+    
+    def _record_conversion(self, timings, unmapped):
+        """Record a conversion's timings and report unmapped names not seen before in this run"""
+        for stage, seconds in timings:
+            self.metrics.observe(stage, seconds)
+        for name in unmapped:
+            if name not in self.unmapped_countries:
+                self.unmapped_countries.add(name)
+                self.log(f"  Unmapped country/region name: {name}")
+    
+    def iter_converted(self, pages):
+        """Convert (search result, PageRecord, tags) items, yielding (page, record, properties, fields, error).
+        
+        Results keep the input order. Pages given without page data (skipped
+        earlier) are passed through with every other item set to None.
+        
+        With `parse_workers` above 1, parsing and conversion run in a process
+        pool while results are still collected in the original order.
+        """
+        if self.parse_workers <= 1:
+            for page, record, tags in pages:
+                if record is None:
+                    yield page, None, None, None, None
+                else:
+                    yield (page, record) + self.parse_and_convert(record, tags)
+            return
+        
+        # Imported here: multiprocessing is only needed with several workers
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Bounded look-ahead window so memory stays flat on large searches
+        window = self.parse_workers * 4
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.parse_workers,
+                                 initializer=_init_parse_worker, initargs=(self,)) as executor:
+            for page, record, tags in pages:
+                future = None
+                if record is not None:
+                    future = executor.submit(_parse_and_convert_worker, record, tags)
+                pending.append((page, record, future))
+                
+                while len(pending) > window:
+                    yield self._resolve_converted(pending.popleft())
+            
+            while pending:
+                yield self._resolve_converted(pending.popleft())
+    
+    def _resolve_converted(self, item):
+        page, record, future = item
+        if future is None:
+            return page, None, None, None, None
+        result, timings, unmapped = future.result()
+        self._record_conversion(timings, unmapped)
+        return (page, record) + result
+    
+    def process_pages_cql(self, cql_query, additional_tags=None, output_dir=None, sync_state=None, resume=False):
+        """Main method to process pages using CQL and generate RIS citations"""
+        return list(self.iter_process_pages_cql(cql_query, additional_tags, output_dir, sync_state, resume))
+    
+    def iter_process_pages_cql(self, cql_query, additional_tags=None, output_dir=None, sync_state=None,
+                               resume=False):
+        """Process pages using CQL, yielding each citation as soon as it is written"""
+        yield from self.iter_process_queries([(cql_query, additional_tags or [])], output_dir, sync_state, resume)
+    
+    def iter_process_queries(self, queries, output_dir=None, sync_state=None, resume=False):
+        """Process the union of several (cql, tags) queries, yielding each citation once it is written.
+        
+        Every matching page is fetched and converted once, with the tags of all
+        the queries it matches. With an output directory, each citation goes
+        straight to its per-page file and to all_citations_<timestamp>.ris, so
+        memory use does not grow with the number of pages. Progress is
+        checkpointed so that an interrupted run can be continued with resume=True.
+        """
+        queries = [(cql_query, list(tags or [])) for cql_query, tags in queries]
+        if self.raw_dump:
+            self.raw_dump.record_run(queries)
+        
+        # One access date for every citation in this run
+        self.access_date = datetime.now().strftime('%Y/%m/%d')
+        self.unmapped_countries = set()
+        self._found_unmapped.clear()
+        self.last_combined_path = None
+        run_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        # Checkpointing (not used for incremental runs, which keep their own manifest)
+        checkpoint = None
+        resume_state = None
+        if output_dir and self.checkpoint_interval and sync_state is None:
+            checkpoint = RunCheckpoint(output_dir, self.checkpoint_interval)
+            header = {
+                'type': 'run',
+                'queries': [[cql_query, tags] for cql_query, tags in queries],
+                'formats': list(self.output_formats),
+                'run_stamp': run_stamp,
+                'access_date': self.access_date
+            }
+            previous = checkpoint.load()
+            if resume and previous and all(previous.get(key) == header[key] for key in ('queries', 'formats')):
+                resume_state = previous
+                run_stamp = previous['run_stamp']
+                self.access_date = previous['access_date']
+                self.log(f"Resuming from search position {previous['position']} "
+                         f"({previous['count']} citations already written)")
+            else:
+                if resume:
+                    self.log("No matching checkpoint found, starting a new run")
+                if previous:
+                    # Discard the partial output of the abandoned run
+                    CitationWriter(output_dir, previous['run_stamp'], previous['formats']).discard_partials()
+            checkpoint.start(header, resume_state)
+        
+        start_position = resume_state['position'] if resume_state else 0
+        completed_ids = resume_state['completed_ids'] if resume_state else set()
+        page_count = 0
+        page_tags = deque()  # tags of search results still in the fetch window, in order
+        
+        def search_results():
+            for page, tags in self.iter_search_queries(queries, start=start_position):
+                page_tags.append(tags)
+                yield page
+        
+        def pages_to_convert():
+            nonlocal page_count
+            # Search results are streamed page by page as they arrive; the body
+            # expanded by the search is used and only pages without one are fetched
+            for page, page_data in self.iter_page_data(search_results()):
+                tags = page_tags.popleft()
+                page_count += 1
+                self.log(f"Processing page: {page['title']} (ID: {page['id']})")
+                if sync_state:
+                    sync_state.observe(page)
+                
+                if page['id'] in completed_ids:
+                    self.log("  Already written before the interruption, skipping")
+                    page_data = None
+                
+                # Only the fields used for conversion are kept from here on
+                record = PageRecord.from_json(page_data) if page_data else None
+                
+                # Incremental runs skip page versions that were already written
+                if record and sync_state and sync_state.is_current(record.id, record.version):
+                    self.log(f"  Unchanged (version {record.version}), skipping")
+                    record = None
+                
+                # Skipped pages still pass through so checkpoint positions stay in order
+                yield page, record, tags
+        
+        # Combined files are only moved into place if the run completes
+        writer_context = contextlib.nullcontext()
+        if output_dir:
+            writer_context = CitationWriter(output_dir, run_stamp, self.output_formats,
+                                            resume_state=resume_state, keep_partial=checkpoint is not None)
+        
+        with writer_context as writer:
+            try:
+                yield from self._iter_written(pages_to_convert(), writer, sync_state, checkpoint, start_position)
+            except BaseException:
+                if checkpoint:
+                    checkpoint.save(writer)
+                    checkpoint.close()
+                    self.log(f"\nCheckpoint saved at search position {checkpoint.position}; "
+                             f"rerun with --resume to continue")
+                raise
+        
+        if checkpoint:
+            checkpoint.finish()
+        
+        if writer and writer.count:
+            self.last_combined_path = writer.combined_path
+        
+        # Incremental runs build the aggregate from the manifest once removals are done
+        if writer and writer.aggregate and sync_state is None:
+            self.save_aggregate(writer.aggregate, output_dir)
+        
+        if page_count == 0 and start_position == 0:
+            self.log("No search results found")
+        else:
+            self.log(f"Found {start_position + page_count} pages")
+        
+        if self._cache is not None:
+            self.log(f"Page cache: {self._cache.hits} hits, {self._cache.misses} misses, "
+                     f"{self._cache.revalidated} revalidated (304)")
+    
+    def _iter_written(self, pages, writer, sync_state, checkpoint=None, position=0):
+        """Convert pages and write each citation through the writer as it is produced"""
+        for page, record, properties, fields, error in self.iter_converted(pages):
+            position += 1
+            citation = None
+            if error:
+                self.log(f"  {error}")
+            elif fields is not None:
+                citation = self._write_citation(page, record, properties, fields, writer, sync_state)
+            
+            # Mark before yielding: the citation is already on disk
+            if checkpoint:
+                checkpoint.mark(position, page['id'], writer)
+            
+            if citation:
+                yield citation
+    
+    def _write_citation(self, page, record, properties, fields, writer, sync_state):
+        """Render one citation in the requested formats and write it if producing output"""
+        page_id = record.id
+        
+        # Render the requested formats from the same fields
+        ris_citation = self.field_mapping.render_ris(fields)
+        csl_item = None
+        if 'csl-json' in self.output_formats:
+            csl_item = self.field_mapping.render_csl_json(record, fields)
+        countries, year = CitationAggregate.summarize(fields)
+        if self.zotero:
+            self.zotero.add(page_id, self.field_mapping.render_zotero(record, fields))
+        
+        # Generate filename from page title
+        filename = self.sanitize_filename(page['title']) + '.ris'
+        
+        citation = Citation(page_id, page['title'], filename, properties, ris_citation, csl_item)
+        
+        # Save individual file and add to the combined files if writing output
+        if writer:
+            with self.metrics.timer('write'):
+                if 'ris' in self.output_formats:
+                    if sync_state and sync_state.is_unchanged(page_id, filename, ris_citation):
+                        self.log(f"  Unchanged: {writer.output_path / filename}")
+                    else:
+                        file_path = writer.write_page(filename, ris_citation)
+                        self.log(f"  Saved: {file_path}")
+                writer.append(ris_citation, csl_item, countries, year)
+                
+                if sync_state:
+                    sync_state.record(page_id, record.version, filename, ris_citation, countries, year)
+        
+        self.log(f"  Generated RIS citation")
+        return citation
+    
+    def process_pages_incremental(self, cql_query, additional_tags=None, output_dir=None):
+        """Process only pages modified since the last run and remove files for vanished pages"""
+        return list(self.iter_process_pages_incremental(cql_query, additional_tags, output_dir))
+    
+    def iter_process_pages_incremental(self, cql_query, additional_tags=None, output_dir=None):
+        """Incremental version of iter_process_pages_cql"""
+        yield from self.iter_process_queries_incremental([(cql_query, additional_tags or [])], output_dir)
+    
+    def iter_process_queries_incremental(self, queries, output_dir=None):
+        """Incremental version of iter_process_queries.
+        
+        State is kept in a manifest inside output_dir. The first run (or a run
+        with different queries, tags or field mapping) processes everything.
+        """
+        sync_state = SyncState(output_dir, log=self.log)
+        run_started = datetime.now()
+        
+        # The manifest records what shaped the output so any change triggers a full run
+        query_key = self.incremental_state_key(queries)
+        run_queries = queries
+        if sync_state.query_key != query_key:
+            # Files of unchanged pages may still be stale, so convert every page again
+            sync_state.forget_versions()
+            self.log("Incremental sync: no usable state found, processing all pages")
+        elif sync_state.modified_since is None:
+            self.log("Incremental sync: no modification times recorded, checking all pages")
+        else:
+            # Confluence reads CQL dates as its own local time, so the window starts from the
+            # server's latest version.when (in the server's offset), not from the local clock
+            since = sync_state.modified_since - timedelta(minutes=self.incremental_overlap_minutes)
+            run_queries = [(f'({cql_query}) AND lastmodified > "{since.strftime("%Y/%m/%d %H:%M")}"', tags)
+                           for cql_query, tags in queries]
+            self.log(f"Incremental sync: pages modified since {since.strftime('%Y-%m-%d %H:%M %z')}")
+        
+        yield from self.iter_process_queries(run_queries, output_dir, sync_state=sync_state)
+        
+        self._remove_vanished_pages([cql_query for cql_query, _ in queries], sync_state)
+        sync_state.save(query_key, run_started)
+        
+        if 'aggregate' in self.output_formats:
+            self.save_aggregate(sync_state.aggregate(), output_dir)
+    
+    def incremental_state_key(self, queries):
+        """Hash of everything that shapes the output files: queries, their tags and the field mapping"""
+        state = {
+            'queries': [[cql_query, list(tags)] for cql_query, tags in queries],
+            'field_mapping': self.field_mapping.spec
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    
+    def save_aggregate(self, aggregate, output_dir):
+        """Write the per-country/per-year aggregate JSON for the WordPress plugins"""
+        aggregate_path = Path(output_dir) / 'citation_aggregates.json'
+        aggregate.save(aggregate_path)
+        self.log(f"Aggregate file: {aggregate_path}")
+    
+    def _remove_vanished_pages(self, cql_queries, sync_state):
+        """Delete output files for pages that no longer match any of the queries"""
+        if not sync_state.pages:
+            return
+        
+        # A lightweight search (ids only) over each full query
+        self.log("Checking for removed pages...")
+        current_ids = set()
+        for cql_query in cql_queries:
+            query_ids = {page['id'] for page in self.iter_search_pages_cql(cql_query, expand='')}
+            
+            # Never delete on a truncated listing (e.g. a failed search request)
+            if self.last_search_total is None or len(query_ids) < self.last_search_total:
+                self.log("  Search listing incomplete, not removing any files")
+                return
+            current_ids |= query_ids
+        
+        for page_id in list(sync_state.pages):
+            if page_id not in current_ids:
+                file_path = sync_state.remove(page_id)
+                self.log(f"  Removed: {file_path} (page {page_id} no longer matches)")
+
+
+def iter_citations(cql, tags=None, config_path="data/config/confluence.yaml", output_dir=None,
+                   incremental=False, resume=False, verbose=False, **settings):
+    """Yield a Citation for every page matching `cql` (a query or a list of queries).
+    
+    This is the library entry point: nothing is printed unless verbose=True.
+    Keyword settings override converter attributes after the config is loaded
+    (e.g. concurrency=4, cache_dir=None, output_formats=['ris', 'csl-json']).
+    Files are only written when output_dir is given. The converter is closed
+    when the generator is exhausted or closed.
+    """
+    if isinstance(cql, str):
+        cql = [cql]
+    queries = [(cql_query, list(tags or [])) for cql_query in cql]
+    if incremental and not output_dir:
+        raise ValueError('incremental runs require an output_dir')
+    
+    converter = ConfluenceRISConverter(config_path, verbose=verbose)
+    try:
+        for name, value in settings.items():
+            if name.startswith('_') or not hasattr(converter, name):
+                raise TypeError(f"iter_citations() got an unknown setting '{name}'")
+            setattr(converter, name, value)
+        converter.configure_http()
+        if converter.zotero:
+            converter.zotero.log = converter.log
+        
+        if incremental:
+            yield from converter.iter_process_queries_incremental(queries, output_dir)
+        else:
+            yield from converter.iter_process_queries(queries, output_dir, resume=resume)
+    finally:
+        converter.close()
+
+
+def split_tags(value):
+    """Split a comma-separated tag string (lists are passed through)"""
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(tag).strip() for tag in value or () if str(tag).strip()]
+
+
+def load_query_file(path):
+    """Load (cql, tags) queries from a YAML list of {cql, tags} entries"""
+    with open(path, 'r') as file:
+        entries = yaml.safe_load(file) or []
+    
+    queries = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'cql': entry}
+        if not isinstance(entry, dict) or not entry.get('cql'):
+            raise ValueError(f"each query needs a 'cql' value: {entry!r}")
+        queries.append((entry['cql'], split_tags(entry.get('tags'))))
+    return queries
+
+
+class _QueryAction(argparse.Action):
+    """-cql: start a new query; -tag options that follow it belong to it"""
+    
+    def __call__(self, parser, namespace, values, option_string=None):
+        queries = list(getattr(namespace, self.dest) or [])
+        queries.append((values, []))
+        setattr(namespace, self.dest, queries)
+
+
+class _TagsAction(argparse.Action):
+    """-tag: tags for the preceding -cql, or for every query when given first"""
+    
+    def __call__(self, parser, namespace, values, option_string=None):
+        if namespace.queries:
+            namespace.queries[-1][1].extend(split_tags(values))
+        else:
+            setattr(namespace, self.dest, list(getattr(namespace, self.dest) or []) + split_tags(values))
+
+
+def create_sample_config():
+    """Create a sample configuration file"""
+    config_dir = Path("data/config")
+    config_dir.mkdir(parents=True, exist_ok=True)
+    
+    config_path = config_dir / "confluence.yaml"
+    
+    sample_config = {
+        'base_url': 'https://confluence.hl7.org',
+        'bearer_token': 'your_personal_access_token_here',
+        'rate_limit_delay': 1.0,  # seconds between requests
+        'rate_limit_burst': 1,  # requests allowed back to back before spacing applies
+        'concurrency': 1,  # parallel page fetches sharing the rate limit
+        'parse_workers': 1,  # processes used for parsing and RIS conversion
+        'max_retries': 3,
+        'retry_delay': 5.0,  # base delay of the jittered exponential retry backoff
+        'retry_max_delay': 60.0,  # longest wait between retries
+        'adaptive_rate_limit': True,  # adjust the request rate from 429/5xx, latency and rate-limit headers
+        'rate_limit_min_delay': 1.0,  # fastest spacing the adaptive limiter may reach (rate ceiling); lower it to allow speeding up
+        'rate_limit_max_delay': 30.0,  # slowest spacing it backs off to (rate floor)
+        'search_page_size': 100,  # results per search request (follows pagination)
+        'search_expand_body': True,  # fetch page bodies in the search request itself
+        'cache_dir': 'data/cache',  # on-disk page cache keyed by page id and version
+        'cache_ttl_days': 30,  # drop cached pages older than this
+        'cache_max_mb': 500,  # evict least recently used pages above this size
+        'conditional_requests': True,  # send If-None-Match/If-Modified-Since for cached responses
+        'http_pool_size': 10,  # connections kept open per host (raise with concurrency)
+        'http_keep_alive': True,  # reuse connections between requests
+        'incremental_overlap_minutes': 60,  # extra lastmodified window for --incremental runs
+        'html_parser': 'stream',  # 'stream' (first table only) or 'bs4' (full BeautifulSoup parse)
+        'field_mapping': 'ris_mapping.yaml',  # property -> RIS tag mapping, relative to this file
+        'country_mappings': None,  # zotero-viz country-mappings.json, relative to this file (required when installed)
+        'output_formats': ['ris'],  # any of 'ris', 'csl-json', 'aggregate'
+        'checkpoint_interval': 25,  # pages between checkpoints for --resume (0 disables)
+        'metrics_file': None,  # run metrics as JSON lines, or a Prometheus textfile if it ends in .prom
+        'zotero': {  # library the --zotero option pushes citations to
+            'library_type': 'group',  # 'group' or 'user'
+            'library_id': None,  # numeric group (or user) id
+            'api_key': 'your_zotero_api_key_here',  # needs write access to the library
+            'collection': None,  # optional collection key to file the items in
+            'concurrency': 2,  # batch uploads in flight at once
+            'state_file': 'data/cache/zotero-items.json'  # Zotero item key, version and hash per page
+        }
+    }
+    
+    with open(config_path, 'w') as f:
+        yaml.dump(sample_config, f, default_flow_style=False)
+    
+    mapping_path = config_dir / "ris_mapping.yaml"
+    if not mapping_path.exists():
+        with open(mapping_path, 'w') as f:
+            yaml.dump(DEFAULT_FIELD_MAPPING, f, default_flow_style=False, sort_keys=False)
+        print(f"Sample field mapping created at: {mapping_path}")
+    
+    print(f"Sample config created at: {config_path}")
+    print("Please edit the file and add your bearer token.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert Confluence page properties to RIS citations',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s -cql 'label="initiative" AND label="fhir_ig"'
+  %(prog)s -cql 'space="FHIR" AND type="page"' -tag "FHIR,Healthcare" -o output/
+  %(prog)s -cql 'title~"Implementation Guide"' -tag "Standards" -o citations/
+  %(prog)s -cql 'label="fhir_ig"' -tag "FHIR" -cql 'label="cda"' -tag "CDA" -o citations/
+  %(prog)s --query-file queries.yaml -o citations/
+  %(prog)s --query-file queries.yaml -o citations/ --dump-raw dump/
+  %(prog)s --from-dump dump/ -o citations/   (offline, e.g. while tuning ris_mapping.yaml)
+  %(prog)s --query-file queries.yaml -o citations/ --zotero
+
+Each -tag applies to the -cql before it (or to every query if it comes first).
+Pages matching several queries are fetched once and get the tags of all of them.
+A query file is a YAML list of entries like {cql: 'label="fhir_ig"', tags: [FHIR]}.
+
+Note: Both "Jurisdiction" and "Region" fields are automatically added as keywords
+and transformed to World Bank standard country names (e.g., UK -> United Kingdom).
+        """
+    )
+    
+    parser.add_argument('-cql', '--cql-query', dest='queries', action=_QueryAction,
+                        help='CQL query string for searching Confluence pages (repeatable)')
+    parser.add_argument('-tag', '--tags', action=_TagsAction,
+                        help='Comma-separated list of additional tags to add as keywords '
+                             '(for the preceding -cql)')
+    parser.add_argument('--query-file',
+                        help='YAML file listing queries, each with a cql and optional tags')
+    parser.add_argument('-o', '--output-dir', 
+                        help='Output directory for RIS files (creates individual files per page)')
+    parser.add_argument('-c', '--config', default='data/config/confluence.yaml',
+                        help='Path to configuration YAML file')
+    parser.add_argument('--delay', type=float, 
+                        help='Override rate limit delay between requests (seconds)')
+    parser.add_argument('--max-retries', type=int,
+                        help='Override maximum number of retries for failed requests')
+    parser.add_argument('--page-size', type=int,
+                        help='Override number of search results requested per page')
+    parser.add_argument('--concurrency', type=int,
+                        help='Number of pages to fetch in parallel (shares one rate limit)')
+    parser.add_argument('--workers', type=int,
+                        help='Number of processes used to parse pages and convert them to RIS')
+    parser.add_argument('--per-page-fetch', action='store_true',
+                        help='Fetch each page separately instead of expanding bodies in the search')
+    parser.add_argument('--cache-dir',
+                        help='Directory for the on-disk page cache')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable the on-disk page cache')
+    parser.add_argument('--format',
+                        help='Comma-separated output formats for --output-dir: '
+                             'ris, csl-json, aggregate (default: ris)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only process pages changed since the last run into --output-dir '
+                             'and remove files for pages that no longer match')
+    parser.add_argument('--html-parser', choices=['stream', 'bs4'],
+                        help='Backend used to parse the page properties table')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted run into --output-dir from its checkpoint')
+    parser.add_argument('--metrics',
+                        help='Write run metrics to this file: JSON lines, or a Prometheus textfile '
+                             'if the name ends in .prom')
+    parser.add_argument('--dump-raw', metavar='DIR',
+                        help='Also save the raw search and page JSON to DIR (gzipped JSON lines)')
+    parser.add_argument('--from-dump', metavar='DIR',
+                        help='Replay searches and pages from a --dump-raw directory instead of '
+                             'contacting Confluence (defaults to the dumped queries)')
+    parser.add_argument('--zotero', action='store_true',
+                        help='Also push the citations to the Zotero library in the config '
+                             '(batched writes; unchanged items are skipped)')
+    parser.add_argument('--create-config', action='store_true',
+                        help='Create a sample configuration file and exit')
+    
+    args = parser.parse_args()
+    
+    # Create sample config if requested
+    if args.create_config:
+        create_sample_config()
+        return
+    
+    if args.incremental and not args.output_dir:
+        parser.error('--incremental requires --output-dir')
+    if args.resume and not args.output_dir:
+        parser.error('--resume requires --output-dir')
+    if args.resume and args.incremental:
+        parser.error('--resume cannot be combined with --incremental (incremental runs keep their own state)')
+    
+    output_formats = None
+    if args.format:
+        output_formats = [fmt.strip() for fmt in args.format.split(',') if fmt.strip()]
+        unknown = [fmt for fmt in output_formats if fmt not in CitationWriter.FORMATS]
+        if unknown:
+            parser.error(f"unknown --format value(s): {', '.join(unknown)}")
+    
+    # Collect queries; tags given before any -cql apply to all of them
+    queries = list(args.queries or [])
+    if args.query_file:
+        try:
+            queries.extend(load_query_file(args.query_file))
+        except (OSError, yaml.YAMLError, ValueError) as e:
+            parser.error(f"cannot read --query-file: {e}")
+    if args.dump_raw and args.from_dump:
+        parser.error('--dump-raw cannot be combined with --from-dump')
+    if args.from_dump and args.incremental:
+        parser.error('--from-dump cannot be combined with --incremental')
+    
+    replay = None
+    if args.from_dump:
+        try:
+            replay = RawDumpReader(args.from_dump)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read --from-dump: {e}")
+        if not queries:
+            queries = list(replay.queries.items())
+    
+    if not queries:
+        parser.error('at least one -cql or --query-file is required')
+    
+    common_tags = args.tags or []
+    queries = [(cql_query, common_tags + [tag for tag in tags if tag not in common_tags])
+               for cql_query, tags in queries]
+    
+    # Initialize converter
+    try:
+        converter = ConfluenceRISConverter(args.config)
+    except ConfigError as e:
+        print(e)
+        sys.exit(1)
+    
+    # Override rate limiting settings if provided
+    if args.delay is not None:
+        converter.rate_limit_delay = args.delay
+    if args.max_retries is not None:
+        converter.max_retries = args.max_retries
+    if args.page_size is not None:
+        converter.search_page_size = args.page_size
+    if args.workers is not None:
+        converter.parse_workers = args.workers
+    if args.per_page_fetch:
+        converter.search_expand_body = False
+    if args.concurrency is not None:
+        converter.concurrency = args.concurrency
+        converter.configure_http()
+    if output_formats:
+        converter.output_formats = output_formats
+    if args.html_parser:
+        converter.html_parser = args.html_parser
+    if args.cache_dir:
+        converter.cache_dir = args.cache_dir
+    if args.no_cache:
+        converter.cache_dir = None
+    if args.metrics:
+        converter.metrics = RunMetrics(args.metrics)
+    if args.dump_raw:
+        converter.raw_dump = RawDumpWriter(args.dump_raw)
+    if args.zotero:
+        try:
+            converter.zotero = ZoteroSink.from_config(converter.config.get('zotero'), log=converter.log)
+        except ValueError as e:
+            converter.close()
+            parser.error(f"cannot push to Zotero: {e}")
+    if replay:
+        # Offline: everything comes from the dump, nothing is cached
+        converter.replay = replay
+        converter.cache_dir = None
+    
+    # Process pages; citations are written (or printed) as they are produced
+    if args.incremental:
+        citations = converter.iter_process_queries_incremental(queries, args.output_dir)
+    else:
+        citations = converter.iter_process_queries(queries, args.output_dir, resume=args.resume)
+    
+    citation_count = 0
+    try:
+        for citation in citations:
+            citation_count += 1
+            if not args.output_dir:
+                print(f"\n--- {citation.title} ---")
+                print(citation.ris)
+    finally:
+        converter.close()
+    
+    # Output summary
+    print(f"\n{'='*60}")
+    print(f"Generated {citation_count} RIS citations")
+    
+    if args.output_dir:
+        print(f"Files saved to: {args.output_dir}")
+    
+    if converter.last_combined_path:
+        print(f"Combined file: {converter.last_combined_path}")
+    
+    converter.metrics.print_summary()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from confluence_ris import ConfluenceRISConverter
+
+
+class MockConfluenceServer:
+    """Local HTTP server imitating the Confluence content search and page endpoints"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {}  # id -> page JSON (with body.view)
+        self.searches = []  # (cql, expand) per search request
+        self.hidden_total = 0  # pages the search counts in totalSize but never returns
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def add_page(self, page_id, title, version=1, country='Germany'):
+        """Add or replace a page-properties page"""
+        rows = [('Initiative Name', title), ('Jurisdiction', country), ('Initiative Start', 'March 2021')]
+        table = ''.join(f'<tr><th>{key}</th><td>{value}</td></tr>' for key, value in rows)
+        with self.lock:
+            self.pages[str(page_id)] = {
+                'id': str(page_id),
+                'type': 'page',
+                'title': title,
+                'version': {'number': version, 'when': f'2026-10-17T10:{version:02d}:00.000-04:00'},
+                'space': {'key': 'TEST'},
+                'metadata': {'labels': {'results': [{'name': 'initiative'}]}},
+                'body': {'view': {'value': f'<table class="confluenceTable"><tbody>{table}</tbody></table>'}}
+            }
+    
+    def _search(self, query):
+        cql = query.get('cql', [''])[0]
+        expand = query.get('expand', [''])[0]
+        start = int(query.get('start', ['0'])[0])
+        limit = int(query.get('limit', ['25'])[0])
+        with self.lock:
+            self.searches.append((cql, expand))
+            matching = [self.pages[page_id] for page_id in sorted(self.pages)]
+            total = len(matching) + self.hidden_total
+        
+        results = []
+        for page in matching[start:start + limit]:
+            if 'body.view' not in expand:
+                page = {name: value for name, value in page.items() if name != 'body'}
+            results.append(page)
+        return {'results': results, 'start': start, 'limit': limit, 'size': len(results), 'totalSize': total}
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/rest/api/content/search':
+                    payload = server._search(parse_qs(url.query))
+                else:
+                    payload = server.pages.get(url.path.rsplit('/', 1)[1])
+                if payload is None:
+                    self.send_error(404)
+                    return
+                
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        return Handler
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    """Minimal confluence.yaml: no cache, no delay, nothing fetched unless a test serves it"""
+    path = tmp_path / 'confluence.yaml'
+    path.write_text("base_url: http://127.0.0.1:9\nrate_limit_delay: 0\ncache_dir: null\n")
+    return path
+
+
+@pytest.fixture
+def converter(config_path):
+    converter = ConfluenceRISConverter(str(config_path), verbose=False)
+    yield converter
+    converter.close()
+
+
+@pytest.fixture
+def confluence(config_path):
+    """A mock Confluence server, with config_path pointing at it"""
+    with MockConfluenceServer() as server:
+        config_path.write_text(f"base_url: {server.base_url}\nrate_limit_delay: 0\ncache_dir: null\n")
+        yield server
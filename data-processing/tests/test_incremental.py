@@ -0,0 +1,81 @@
+"""Incremental sync state, and incremental runs against a mock Confluence"""
+
+import json
+
+from confluence_ris import SyncState, iter_citations
+
+
+def ris(title, access_date='2026/10/17'):
+    return f"TY  - STAND\nTI  - {title}\nY2  - {access_date}\nER  - \n"
+
+
+def test_new_access_date_alone_is_unchanged(tmp_path):
+    state = SyncState(tmp_path, log=lambda message: None)
+    (tmp_path / 'a.ris').write_text(ris('A'), encoding='utf-8')
+    state.record('1', 3, 'a.ris', ris('A'))
+    
+    assert state.is_unchanged('1', 'a.ris', ris('A', access_date='2026/10/18'))
+    assert not state.is_unchanged('1', 'a.ris', ris('A renamed', access_date='2026/10/18'))
+    
+    # The file written on an earlier day still counts as intact
+    assert state.is_current('1', 3)
+
+
+def run(config_path, output_dir, **settings):
+    citations = iter_citations('label="initiative"', config_path=str(config_path), output_dir=str(output_dir),
+                               incremental=True, **settings)
+    return [citation.page_id for citation in citations]
+
+
+def manifest(output_dir):
+    return json.loads((output_dir / SyncState.MANIFEST_NAME).read_text())
+
+
+def test_second_run_skips_unchanged_versions(confluence, config_path, tmp_path):
+    output_dir = tmp_path / 'output'
+    for index in range(3):
+        confluence.add_page(index + 1, f"Initiative {index}")
+    assert sorted(run(config_path, output_dir)) == ['1', '2', '3']
+    written = {path.name: path.stat().st_mtime_ns for path in output_dir.glob('initiative_*.ris')}
+    
+    confluence.add_page(2, "Initiative 1", version=2, country='France')
+    assert run(config_path, output_dir) == ['2']
+    
+    # Only the new version was converted, and the search was limited to recent changes
+    assert manifest(output_dir)['pages']['2']['version'] == 2
+    assert 'lastmodified >' in confluence.searches[-2][0]
+    assert 'France' in (output_dir / 'initiative_1.ris').read_text()
+    for name in ('initiative_0.ris', 'initiative_2.ris'):
+        assert (output_dir / name).stat().st_mtime_ns == written[name]
+
+
+def test_vanished_page_is_deleted_and_tombstoned(confluence, config_path, tmp_path):
+    output_dir = tmp_path / 'output'
+    confluence.add_page(1, "Initiative 0")
+    confluence.add_page(2, "Initiative 1")
+    run(config_path, output_dir)
+    
+    del confluence.pages['2']
+    run(config_path, output_dir)
+    
+    assert not (output_dir / 'initiative_1.ris').exists()
+    assert (output_dir / 'initiative_0.ris').exists()
+    state = manifest(output_dir)
+    assert '2' not in state['pages']
+    assert state['deleted']['2']['filename'] == 'initiative_1.ris'
+
+
+def test_incomplete_listing_deletes_nothing(confluence, config_path, tmp_path):
+    output_dir = tmp_path / 'output'
+    confluence.add_page(1, "Initiative 0")
+    confluence.add_page(2, "Initiative 1")
+    run(config_path, output_dir)
+    
+    # The search counts a page it does not return
+    del confluence.pages['2']
+    confluence.hidden_total = 1
+    run(config_path, output_dir)
+    
+    assert (output_dir / 'initiative_1.ris').exists()
+    state = manifest(output_dir)
+    assert '2' in state['pages'] and not state['deleted']
@@ -0,0 +1,62 @@
+"""Library use: errors are raised as exceptions and nothing is printed unless verbose"""
+
+import pytest
+
+from confluence_ris import ConfigError, ConfluenceRISConverter, SyncState, iter_citations
+
+
+def test_missing_config_raises_config_error(tmp_path):
+    with pytest.raises(ConfigError):
+        list(iter_citations('label="initiative"', config_path=str(tmp_path / 'missing.yaml')))
+
+
+def test_invalid_field_mapping_raises_config_error(config_path):
+    (config_path.parent / 'ris_mapping.yaml').write_text("- not\n- a mapping\n")
+    with pytest.raises(ConfigError):
+        ConfluenceRISConverter(str(config_path))
+
+
+def test_empty_field_mapping_keeps_the_default(config_path):
+    (config_path.parent / 'ris_mapping.yaml').write_text("# nothing here\n")
+    converter = ConfluenceRISConverter(str(config_path), verbose=False)
+    assert converter.field_mapping.type == 'STD'
+    converter.close()
+
+
+def test_unknown_setting_is_rejected(config_path):
+    with pytest.raises(TypeError):
+        list(iter_citations('label="initiative"', config_path=str(config_path), no_such_setting=1))
+
+
+def test_quiet_converter_prints_nothing(config_path, tmp_path, capsys):
+    (tmp_path / 'output').mkdir()
+    (tmp_path / 'output' / SyncState.MANIFEST_NAME).write_text("{not json")
+    converter = ConfluenceRISConverter(str(config_path), verbose=False)
+    SyncState(tmp_path / 'output', log=converter.log)
+    converter.log("progress")
+    converter.close()
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.parametrize('parse_workers', [1, 2])
+def test_unmapped_countries_are_reported_once(confluence, config_path, capfd, parse_workers):
+    for index in range(6):
+        confluence.add_page(index + 1, f"Initiative {index}", country='Atlantis, Germany')
+    
+    converter = ConfluenceRISConverter(str(config_path))
+    converter.parse_workers = parse_workers
+    converter.process_pages_cql('label="initiative"')
+    converter.close()
+    
+    # Worker processes hand the names back instead of printing them
+    assert capfd.readouterr().out.count('Unmapped country/region name: Atlantis') == 1
+    assert converter.unmapped_countries == {'Atlantis'}
+
+
+def test_parsed_keys_share_the_mapping_property_names(converter):
+    properties = converter.parse_html_table('<table><tr><th>Initiative Name</th><td>A</td></tr>'
+                                            '<tr><th>Not Mapped</th><td>B</td></tr></table>')
+    
+    mapped = next(key for key in properties if key == 'Initiative Name')
+    assert mapped is converter.field_mapping.property_names['Initiative Name']
+    assert 'Not Mapped' not in converter.field_mapping.property_names
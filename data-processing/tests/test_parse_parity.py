@@ -0,0 +1,99 @@
+"""Parity of the streaming properties-table extractor with the BeautifulSoup backend"""
+
+import random
+
+import pytest
+
+pytest.importorskip('bs4')
+
+
+def row(name, value):
+    return f"<tr><th>{name}</th><td>{value}</td></tr>"
+
+
+def table(*rows):
+    return "<table><tbody>" + ''.join(rows) + "</tbody></table>"
+
+
+CASES = {
+    'plain': table(row('Initiative Name', 'Init 1'), row('Jurisdiction', 'UK, USA')),
+    'no table': "<div><p>No properties here</p></div>",
+    'empty': "",
+    'content around the table': (
+        "<h1>Title</h1><p>intro</p>" + table(row('Name', 'first')) + table(row('Name', 'second')) + "<p>end</p>"
+    ),
+    'void elements': table(
+        row('Links', "one<br>two<br/>three"),
+        row('Image', "<img src='x.png' alt='x'>after image"),
+        row('Rule', "above<hr>below<wbr>joined<input type='text' value='v'>")
+    ),
+    'unclosed p': table(row('Notes', "<p>first<p>second<p>third")),
+    'unclosed li': table(row('Types', "<ul><li>alpha<li>beta<li><a href='http://x/1'>gamma</a></ul>")),
+    'unclosed td and tr': "<table><tr><th>A<td>one<tr><th>B<td>two<td>extra</table>",
+    'unclosed table': "<table><tr><th>A</th><td>one</td></tr><tr><th>B</th><td>two",
+    'nested tables': table(
+        row('Outer', table(row('Inner', 'inner value'), row('Inner 2', "<a href='http://in/1'>in</a>"))),
+        row('After', 'after the nested table')
+    ),
+    'entities and charrefs': table(
+        row('Org &amp; Co', "caf&eacute; &lt;b&gt; &#169; &#x2014; a&nbsp;b &copy 2020 &amp;amp; &unknown;"),
+        row('Numeric', "&#8212;&#39;&quot;&#X41;"),
+        row('Unusual', "&copyName &#1; &#150; &#129; &#0; &#xD800; &#1114112; &#65abc &#x41zz;")
+    ),
+    'cdata and comments': table(
+        row('Comment', "before<!-- hidden <td>not a cell</td> -->after"),
+        row('CDATA', "x<![CDATA[raw <b>text</b>]]>y"),
+        row('Declaration', "<!DOCTYPE html>z<?pi instruction?>w")
+    ),
+    'script inside cells': table(
+        row('Script', "<script>var cell = '<td>fake</td>'; if (a < b) {}</script>visible"),
+        row('Style', "<style>td { color: red; }</style>styled")
+    ),
+    'a href without value': table(
+        row('Bare href', "<a href>bare</a> <a href=''>empty</a> <a name='n'>no href</a>"),
+        row('Links', "<a href='http://x/1'>x</a><br/><a HREF=\"http://x/2\">y</a>")
+    ),
+    'end tag without start tag': table(
+        row('Stray', "one</span>two</p>three</b>"),
+        row('Stray cell end', "value</td></td>"),
+        "</tr>",
+        row('Next', 'still parsed')
+    ),
+    'whitespace and nested markup': table(
+        row('  Spaced  Name ', "\n  <b>bold</b>\n <i> italic </i>  \n"),
+        row('Div', "<div><span>a</span><div>b</div></div>")
+    ),
+    'single cell and header rows': (
+        "<table><tr><th colspan='2'>Header</th></tr><tr><td>only one</td></tr>"
+        + row('Name', 'value') + "</table>"
+    )
+}
+
+
+def assert_parity(converter, html_content):
+    converter.html_parser = 'bs4'
+    expected = converter.parse_html_table(html_content)
+    converter.html_parser = 'stream'
+    assert converter.parse_html_table(html_content) == expected
+
+
+@pytest.mark.parametrize('html_content', list(CASES.values()), ids=list(CASES))
+def test_stream_parser_matches_bs4(converter, html_content):
+    assert_parity(converter, html_content)
+
+
+FRAGMENTS = [
+    '<table>', '</table>', '<tr>', '</tr>', '<th>', '</th>', '<td>', '</td>', '<tbody>', '</tbody>',
+    '<p>', '</p>', '<li>', '<ul>', '</ul>', '<br>', '<br/>', '<img src="i">', '<hr>',
+    '<a href="http://x/1">', '<a href>', '</a>', '<b>', '</b>', '</span>', '<div>', '</div>',
+    '<!-- c -->', '<![CDATA[d]]>', '<script>s<td></script>', '&amp;', '&#169;', '&copy', '&nbsp;',
+    '&#1;', '&#150;', '&#x41', '&',
+    'Name', 'value', ', ', '\n', '  '
+]
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_stream_parser_matches_bs4_on_random_markup(converter, seed):
+    rng = random.Random(seed)
+    html_content = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(5, 80)))
+    assert_parity(converter, html_content)
@@ -0,0 +1,58 @@
+"""AdaptiveRateLimiter stays within the configured rate unless a faster ceiling is set"""
+
+from confluence_ris import AdaptiveRateLimiter
+
+
+def fast_responses(limiter, count=300):
+    for _ in range(count):
+        limiter.record_response(200, 0.01, {})
+
+
+def quiet_limiter(*args, **kwargs):
+    limiter = AdaptiveRateLimiter(*args, **kwargs)
+    limiter.log = lambda message: None
+    return limiter
+
+
+def test_default_ceiling_is_the_configured_rate():
+    limiter = quiet_limiter(1.0)
+    fast_responses(limiter)
+    assert limiter.interval == 1.0
+
+
+def test_explicit_ceiling_allows_speeding_up():
+    limiter = quiet_limiter(1.0, min_interval=0.25)
+    fast_responses(limiter)
+    assert limiter.interval == 0.25
+
+
+def test_reset_sets_the_ceiling():
+    limiter = quiet_limiter(1.0, min_interval=0.25)
+    limiter.reset(2.0)
+    fast_responses(limiter)
+    assert limiter.interval == 2.0
+
+
+def test_backs_off_and_recovers_to_the_ceiling():
+    limiter = quiet_limiter(1.0, max_interval=8.0)
+    limiter.record_response(429, 0.01, {})
+    assert limiter.interval == 2.0
+    fast_responses(limiter)
+    assert limiter.interval == 1.0
+
+
+def test_only_turning_points_are_logged():
+    messages = []
+    limiter = AdaptiveRateLimiter(0.5, min_interval=0.1)
+    limiter.log = messages.append
+    fast_responses(limiter)
+    assert len(messages) == 1 and 'speeding up' in messages[0]
+
+
+def test_unlimited_backs_off_from_the_observed_rate_and_recovers():
+    limiter = quiet_limiter(0)
+    fast_responses(limiter, 5)
+    limiter.record_response(429, 0.01, {})
+    assert 0 < limiter.interval <= 2 * AdaptiveRateLimiter.BACKOFF_MIN
+    fast_responses(limiter, 100)
+    assert limiter.interval == 0
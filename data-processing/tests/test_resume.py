@@ -0,0 +1,47 @@
+"""An interrupted run continued with resume=True gives the same output as an uninterrupted one"""
+
+import pytest
+
+from confluence_ris import iter_citations
+
+SETTINGS = {'output_formats': ['ris', 'csl-json'], 'checkpoint_interval': 4, 'search_page_size': 7,
+            'concurrency': 3}
+
+
+def citations(config_path, output_dir, resume=False):
+    return iter_citations('label="initiative"', config_path=str(config_path), output_dir=str(output_dir),
+                          resume=resume, **SETTINGS)
+
+
+def combined_output(output_dir):
+    return {suffix: [path.read_bytes() for path in sorted(output_dir.glob(f'all_citations_*{suffix}'))]
+            for suffix in ('.ris', '.json')}
+
+
+@pytest.mark.parametrize('crashed', [False, True])
+@pytest.mark.parametrize('interrupt_after', [1, 9, 17])
+def test_resumed_run_is_byte_identical(confluence, config_path, tmp_path, interrupt_after, crashed):
+    for index in range(30):
+        confluence.add_page(index + 1, f"Initiative {index}", country=['Germany', 'France', 'Kenya'][index % 3])
+    
+    expected_dir = tmp_path / 'expected'
+    assert len(list(citations(config_path, expected_dir))) == 30
+    
+    output_dir = tmp_path / 'output'
+    run = citations(config_path, output_dir)
+    for _ in range(interrupt_after):
+        next(run)
+    run.close()
+    assert combined_output(output_dir) == {'.ris': [], '.json': []}
+    if crashed:
+        # Output written after the last checkpoint is dropped on resume
+        for partial_path in output_dir.glob('*.partial'):
+            with open(partial_path, 'ab') as f:
+                f.write(b'TY  - STAND\nTI  - half a citation')
+    
+    resumed = list(citations(config_path, output_dir, resume=True))
+    assert len(resumed) < 30
+    
+    expected = combined_output(expected_dir)
+    assert all(len(outputs) == 1 for outputs in expected.values())
+    assert combined_output(output_dir) == expected
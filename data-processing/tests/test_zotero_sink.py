@@ -0,0 +1,179 @@
+"""ZoteroSink against a local stand-in for the Zotero Web API write endpoint"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from confluence_ris import ZoteroSink
+
+
+class MockZoteroServer:
+    """Local HTTP server imitating POST /groups/{id}/items with version checks"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}  # key -> {'version', 'data'}
+        self.library_version = 0
+        self.posts = []  # (item count, Zotero-Write-Token header) per accepted request
+        self.queued_errors = []  # (status, headers) returned before handling the next requests
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    
+    @property
+    def api_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def edit(self, key):
+        """Change an item as if someone edited it in Zotero"""
+        with self.lock:
+            self.library_version += 1
+            self.items[key]['version'] = self.library_version
+    
+    def _write(self, batch):
+        self.library_version += 1
+        result = {'successful': {}, 'success': {}, 'unchanged': {}, 'failed': {}}
+        for index, item in enumerate(batch):
+            index = str(index)
+            key = item.pop('key', None)
+            version = item.pop('version', None)
+            if key:
+                current = self.items.get(key)
+                if current is None:
+                    result['failed'][index] = {'key': key, 'code': 404, 'message': 'Item does not exist'}
+                    continue
+                if current['version'] != version:
+                    result['failed'][index] = {'key': key, 'code': 412, 'message': 'Item has been modified'}
+                    continue
+                if current['data'] == item:
+                    result['unchanged'][index] = key
+                    continue
+            else:
+                key = f"ITEM{len(self.items):04d}"
+            self.items[key] = {'version': self.library_version, 'data': item}
+            result['successful'][index] = {'key': key, 'version': self.library_version, 'data': item}
+            result['success'][index] = key
+        return result
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def _send(self, status, payload=None, headers=()):
+                body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_POST(self):
+                batch = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with server.lock:
+                    if server.queued_errors:
+                        status, headers = server.queued_errors.pop(0)
+                        self._send(status, headers=headers.items())
+                        return
+                    if self.headers.get('Zotero-API-Key') != 'secret' or len(batch) > ZoteroSink.BATCH_SIZE:
+                        self._send(400)
+                        return
+                    server.posts.append((len(batch), self.headers.get('Zotero-Write-Token')))
+                    result = server._write(batch)
+                    version = str(server.library_version)
+                self._send(200, result, [('Last-Modified-Version', version)])
+        
+        return Handler
+
+
+@pytest.fixture
+def server():
+    with MockZoteroServer() as server:
+        yield server
+
+
+@pytest.fixture
+def make_sink(server, tmp_path):
+    def make_sink(**options):
+        return ZoteroSink(1, 'secret', state_file=tmp_path / 'zotero-items.json', api_url=server.api_url,
+                          retry_delay=0.01, log=lambda message: None, **options)
+    return make_sink
+
+
+def item(index, access_date='2026-10-17', title=None):
+    return {'itemType': 'standard', 'title': title or f"Initiative {index}", 'accessDate': access_date}
+
+
+def publish(sink, items):
+    for page_id, page_item in items.items():
+        sink.add(page_id, page_item)
+    sink.close()
+    return sink.counts
+
+
+def test_batches_of_fifty_with_write_tokens(server, make_sink):
+    counts = publish(make_sink(concurrency=3), {str(index): item(index) for index in range(120)})
+    
+    assert sorted(size for size, _ in server.posts) == [20, 50, 50]
+    tokens = [token for _, token in server.posts]
+    assert all(tokens) and len(set(tokens)) == 3
+    assert counts['created'] == 120 and counts['requests'] == 3
+    assert len(server.items) == 120
+
+
+def test_rerun_sends_nothing_for_unchanged_items(server, make_sink):
+    publish(make_sink(), {str(index): item(index) for index in range(120)})
+    
+    # A new access date alone does not count as a change
+    counts = publish(make_sink(), {str(index): item(index, access_date='2026-10-18') for index in range(120)})
+    assert counts['unchanged'] == 120 and counts['requests'] == 0
+    assert len(server.posts) == 3
+
+
+def test_item_edited_in_zotero_is_a_conflict(server, make_sink, tmp_path):
+    publish(make_sink(), {'1': item(1), '2': item(2)})
+    state = json.loads((tmp_path / 'zotero-items.json').read_text())
+    server.edit(state['items']['1']['key'])
+    
+    counts = publish(make_sink(), {'1': item(1, title='Renamed'), '2': item(2, title='Renamed too')})
+    assert counts['conflicts'] == 1 and counts['updated'] == 1
+    assert server.items[state['items']['1']['key']]['data']['title'] == 'Initiative 1'
+    
+    # Updates go out with the known version and without a write token
+    assert server.posts[-1] == (2, None)
+
+
+def test_item_deleted_in_zotero_is_forgotten(server, make_sink, tmp_path):
+    publish(make_sink(), {'1': item(1)})
+    state_path = tmp_path / 'zotero-items.json'
+    key = json.loads(state_path.read_text())['items']['1']['key']
+    del server.items[key]
+    
+    counts = publish(make_sink(), {'1': item(1, title='Renamed')})
+    assert counts['failed'] == 1
+    assert '1' not in json.loads(state_path.read_text())['items']
+    
+    # The next run creates it again
+    counts = publish(make_sink(), {'1': item(1, title='Renamed')})
+    assert counts['created'] == 1
+
+
+def test_rate_limited_batch_is_retried(server, make_sink):
+    server.queued_errors.append((429, {'Retry-After': '0.05'}))
+    
+    counts = publish(make_sink(), {str(index): item(index) for index in range(10)})
+    assert counts['created'] == 10 and counts['requests'] == 2
+    assert [size for size, _ in server.posts] == [10]